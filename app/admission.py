@@ -0,0 +1,128 @@
+"""admission control and load shedding for the CPU-bound endpoints"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+HIGH = 0  # cheap requests: autocomplete
+LOW = 1  # full matrix scans
+
+
+class Overloaded(Exception):
+    """request shed by admission control, retry after `retry_after` seconds"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Per-worker admission control, used from the event loop:
+    - at most `max_concurrency` admitted requests run at a time
+    - up to `max_queue` requests wait, served by priority (HIGH before
+      LOW) and then in arrival order
+    - a request is shed with Overloaded when the queue is full, when its
+      estimated wait (from a moving average of service time) already
+      exceeds its deadline, or when the deadline passes while queued
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        max_queue: int = 64,
+        deadline: float = 5.0,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self.running = 0
+        self.service_time = 0.05  # seconds, exponential moving average
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self.counters = {
+            "admitted": 0,
+            "queued": 0,
+            "shed_queue_full": 0,
+            "shed_deadline": 0,
+            "timed_out": 0,
+        }
+
+    def waiting(self) -> int:
+        return sum(1 for _, _, f in self._waiters if not f.done())
+
+    def _queued_ahead(self, priority: int) -> int:
+        return sum(1 for p, _, f in self._waiters if p <= priority and not f.done())
+
+    def estimated_wait(self, priority: int = LOW) -> float:
+        ahead = self._queued_ahead(priority)
+        return (ahead / max(1, self.max_concurrency) + 0.5) * self.service_time
+
+    def _shed(self, counter: str, reason: str, wait: float) -> Overloaded:
+        self.counters[counter] += 1
+        return Overloaded(reason, retry_after=max(1.0, math.ceil(wait)))
+
+    async def _acquire(self, priority: int, deadline: float) -> None:
+        if self.running < self.max_concurrency and not self.waiting():
+            self.running += 1
+            return
+        wait = self.estimated_wait(priority)
+        if self.waiting() >= self.max_queue:
+            raise self._shed("shed_queue_full", "queue full", wait)
+        if wait > deadline:
+            raise self._shed("shed_deadline", "would miss deadline", wait)
+
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        self.counters["queued"] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), deadline)
+        except asyncio.TimeoutError:
+            if not fut.done():
+                fut.cancel()
+                raise self._shed("timed_out", "deadline passed in queue", wait)
+        except asyncio.CancelledError:
+            # the client went away: give back a slot handed to us meanwhile
+            if fut.done() and not fut.cancelled():
+                self._release()
+            fut.cancel()
+            raise
+
+    def _release(self) -> None:
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)  # the slot passes to the waiter
+                return
+        self.running -= 1
+
+    @asynccontextmanager
+    async def admit(self, priority: int = LOW, deadline: Optional[float] = None):
+        await self._acquire(priority, self.deadline if deadline is None else deadline)
+        self.counters["admitted"] += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.service_time = 0.8 * self.service_time + 0.2 * elapsed
+            self._release()
+
+    def stats(self) -> dict:
+        shed = sum(
+            self.counters[k] for k in ("shed_queue_full", "shed_deadline", "timed_out")
+        )
+        return {
+            **self.counters,
+            "shed": shed,
+            "running": self.running,
+            "waiting": self.waiting(),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "service_time_ms": round(self.service_time * 1000, 2),
+        }
@@ -0,0 +1,87 @@
+"""lay-term alias tables and statistics of inputs the aliases did not cover"""
+
+import csv
+import json
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+
+def load_alias_table(path: Path) -> dict[str, str]:
+    """
+    Read phrase -> symptom column pairs from JSON ({"tummy ache": "..."})
+    or CSV (columns alias, symptom; rows without a symptom are skipped).
+    """
+    if path.suffix.lower() == ".csv":
+        with path.open(newline="", encoding="utf-8") as f:
+            return {
+                row["alias"]: row["symptom"]
+                for row in csv.DictReader(f)
+                if row.get("alias") and row.get("symptom")
+            }
+    table = json.loads(path.read_text(encoding="utf-8"))
+    if not isinstance(table, dict):
+        raise ValueError(f"alias table must be a JSON object: {path}")
+    return {str(k): str(v) for k, v in table.items()}
+
+
+class ResolutionStats:
+    """
+    Counts how input tokens were resolved (exact, alias, fuzzy, unmatched)
+    and remembers the most frequent fuzzy and unmatched tokens, trimmed to
+    the `max_keys` most common ones.
+    """
+
+    def __init__(self, max_keys: int = 10_000):
+        self.max_keys = max_keys
+        self.counts: Counter = Counter()
+        self.fuzzy: Counter = Counter()  # (token, column) -> count
+        self.unmatched: Counter = Counter()  # token -> count
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, token: str, col: Optional[str] = None) -> None:
+        with self._lock:
+            self.counts[kind] += 1
+            if kind == "fuzzy":
+                self._bump(self.fuzzy, (token, col))
+            elif kind == "unmatched" and token:
+                self._bump(self.unmatched, token)
+
+    def _bump(self, counter: Counter, key) -> None:
+        counter[key] += 1
+        if len(counter) > self.max_keys:
+            keep = counter.most_common(self.max_keys // 2)
+            counter.clear()
+            counter.update(dict(keep))
+
+    def top_misses(self, n: int = 50) -> dict:
+        with self._lock:
+            return {
+                "counts": dict(self.counts),
+                "fuzzy": [
+                    {"input": token, "symptom": col, "count": count}
+                    for (token, col), count in self.fuzzy.most_common(n)
+                ],
+                "unmatched": [
+                    {"input": token, "count": count}
+                    for token, count in self.unmatched.most_common(n)
+                ],
+            }
+
+    def export(self, path: Path, n: int = 500) -> int:
+        """
+        Write the top misses as an alias CSV (alias, symptom, fuzzy_guess,
+        kind, count) with symptom left empty to be filled in; fuzzy rows put
+        the fuzzy match in fuzzy_guess. Returns the number of rows written.
+        """
+        misses = self.top_misses(n)
+        rows = [
+            (m["input"], "", m["symptom"], "fuzzy", m["count"]) for m in misses["fuzzy"]
+        ] + [(m["input"], "", "", "unmatched", m["count"]) for m in misses["unmatched"]]
+        rows.sort(key=lambda r: r[4], reverse=True)
+        with path.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["alias", "symptom", "fuzzy_guess", "kind", "count"])
+            writer.writerows(rows)
+        return len(rows)
@@ -2,10 +2,18 @@
 
 from pathlib import Path
 import pandas as pd
+import numpy as np
 import logging
 import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from typing import Optional
 
+from app.aliases import ResolutionStats, load_alias_table
+from app.sharding import ShardedScorer, dedup_top_k
+
 try:
     from rapidfuzz import process as rf_process
 
@@ -15,14 +23,117 @@ except Exception:
 
     _HAS_RAPIDFUZZ = False
 
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
-)
+# max distinct (token, cutoff) fuzzy results cached per snapshot
+TOKEN_CACHE_SIZE = 100_000
+_MISSING = object()  # token_cache sentinel, None is a cached "no match"
+# results of recent find_diseases_by_symptoms calls kept per snapshot (LRU)
+RESULT_CACHE_SIZE = 4096
+# rows scored per matmul in find_diseases_batch (bounds the score buffer)
+BATCH_ROW_CHUNK = 65_536
+# seconds between checks of the alias file for changes
+ALIAS_CHECK_INTERVAL = 1.0
+# rough sizes of cache entries, used by memory_bytes()
+TOKEN_CACHE_ENTRY_BYTES = 250
+RESULT_CACHE_ROW_BYTES = 800
+
+logger = logging.getLogger(__name__)
+
+
+class MatrixSnapshot:
+    """
+    One loaded version of the symptom matrix together with its indexes.
+    Queries pin it with acquire()/release(); a retired snapshot (replaced
+    by a reload or dropped by DataLoader.close) releases its scorer once
+    the last query using it is done.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        symptom_cols: list[str],
+        col_index: dict[str, str],
+        stamp: tuple,
+    ):
+        self.df = df
+        self.symptom_cols = symptom_cols
+        self.col_index = col_index
+        self.normalized_cols = list(col_index.keys())
+        self.col_pos = {c: i for i, c in enumerate(symptom_cols)}
+        self.stamp = stamp
+        self.df_bytes = int(df.memory_usage(deep=True).sum())
+        self.scorer: Optional[ShardedScorer] = None
+        self.matrix: Optional[np.ndarray] = None
+        self.codes: Optional[np.ndarray] = None
+        self.token_cache: dict[tuple[str, float], Optional[str]] = {}
+        self.cache_lock = threading.Lock()
+        # normalized alias phrase -> normalized column, compiled per snapshot
+        self.aliases: dict[str, str] = {}
+        self.alias_stamp: Optional[tuple] = None
+        self.alias_checked: Optional[float] = None  # time.monotonic()
+        # key -> (results, resolutions recorded while computing them)
+        self.result_cache: OrderedDict[tuple, tuple] = OrderedDict()
+        self.result_rows = 0  # result dicts held by result_cache
+        self._users = 0
+        self._retired = False
+        self._pin_lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        """pin for a query; False if already retired"""
+        with self._pin_lock:
+            if self._retired:
+                return False
+            self._users += 1
+            return True
+
+    def release(self) -> None:
+        with self._pin_lock:
+            self._users -= 1
+            close = self._retired and self._users == 0
+        if close:
+            self._close()
+
+    def retire(self) -> None:
+        """close now if unused, otherwise when the last user releases it"""
+        with self._pin_lock:
+            self._retired = True
+            close = self._users == 0
+        if close:
+            self._close()
+
+    def _close(self) -> None:
+        if self.scorer is not None:
+            self.scorer.close()
+            self.scorer = None
 
 
 class DataLoader:
-    def __init__(self, data_source: Path):
+    """
+    Loads the symptom matrix and matches user symptoms against it.
+    Inputs are resolved by exact column name, then by the alias table
+    (alias_source, reloaded when the file changes), then by fuzzy match;
+    resolution_stats keeps the inputs that needed fuzzy or did not match.
+    With shards > 1 the matrix is scored by a ShardedScorer: the row space
+    is split into `shards` pieces scored on `workers` processes (or threads
+    with executor="thread") and the per-shard top-k lists are merged.
+    """
+
+    def __init__(
+        self,
+        data_source: Path,
+        shards: int = 1,
+        workers: Optional[int] = None,
+        executor: str = "process",
+        alias_source: Optional[Path] = None,
+    ):
         self.data_source = data_source
+        self.shards = shards
+        self.workers = workers
+        self.executor = executor
+        self.alias_source = Path(alias_source) if alias_source else None
+        self.alias_check_interval = ALIAS_CHECK_INTERVAL
+        self.resolution_stats = ResolutionStats()
+        self._snapshot: Optional[MatrixSnapshot] = None
+        self._load_lock = threading.Lock()
 
     def _normalize_text(self, s: str) -> str:
         s = (s or "").strip().lower()
@@ -62,25 +173,208 @@ class DataLoader:
         symptom_cols = [c for c in df.columns if c != "diseases"]
         return df, symptom_cols
 
-    def find_diseases_by_symptoms(
+    def _file_stamp(self) -> tuple:
+        if not self.data_source.exists():
+            raise FileNotFoundError(f"file not found: {self.data_source}")
+        st = self.data_source.stat()
+        return (st.st_mtime_ns, st.st_size)
+
+    def snapshot(self) -> MatrixSnapshot:
+        """cached matrix and indexes, reloaded when the data file changes"""
+        stamp = self._file_stamp()
+        snap = self._snapshot
+        if snap is not None and snap.stamp == stamp:
+            return snap
+        with self._load_lock:
+            # another thread may have loaded it while we waited
+            stamp = self._file_stamp()
+            snap = self._snapshot
+            if snap is None or snap.stamp != stamp:
+                df, symptom_cols = self.load_matrix()
+                new = MatrixSnapshot(
+                    df, symptom_cols, self._build_col_index(symptom_cols), stamp
+                )
+                if self.shards > 1:
+                    new.scorer = self._build_scorer(new)
+                self._snapshot = new
+                if snap is not None:
+                    snap.retire()
+                snap = new
+        return snap
+
+    def is_current(self, snap: Optional[MatrixSnapshot] = None) -> bool:
+        """whether snap (default: the cached snapshot) matches the data file;
+        one stat(), never loads"""
+        snap = snap or self._snapshot
+        try:
+            return snap is not None and snap.stamp == self._file_stamp()
+        except FileNotFoundError:
+            return False
+
+    @contextmanager
+    def lease(self):
+        """current snapshot, pinned so a concurrent reload cannot close it"""
+        while True:
+            snap = self.snapshot()
+            if snap.acquire():
+                break
+        try:
+            yield snap
+        finally:
+            snap.release()
+
+    def _matrix_arrays(self, snap: MatrixSnapshot) -> tuple[np.ndarray, np.ndarray]:
+        """dense float32 symptom matrix and integer disease codes"""
+        matrix = snap.df[snap.symptom_cols].fillna(0).to_numpy(dtype=np.float32)
+        codes, _ = pd.factorize(snap.df["diseases"])
+        return matrix, codes
+
+    def _dense(self, snap: MatrixSnapshot) -> tuple[np.ndarray, np.ndarray]:
+        """matrix arrays of a snapshot, shared with its scorer when there is one"""
+        if snap.scorer is not None:
+            return snap.scorer.matrix, snap.scorer.codes
+        if snap.matrix is None:
+            snap.matrix, snap.codes = self._matrix_arrays(snap)
+        return snap.matrix, snap.codes
+
+    def _build_scorer(self, snap: MatrixSnapshot) -> ShardedScorer:
+        matrix, codes = self._matrix_arrays(snap)
+        return ShardedScorer(
+            matrix,
+            codes,
+            shards=self.shards,
+            workers=self.workers,
+            executor=self.executor,
+        )
+
+    def memory_bytes(self) -> int:
+        """
+        Approximate memory held by the cached snapshot (0 when not loaded):
+        the frame, dense arrays built so far and an estimate of the caches.
+        """
+        snap = self._snapshot
+        if snap is None:
+            return 0
+        total = snap.df_bytes
+        if snap.matrix is not None:
+            total += snap.matrix.nbytes + snap.codes.nbytes
+        if snap.scorer is not None:
+            total += snap.scorer.nbytes
+        total += len(snap.token_cache) * TOKEN_CACHE_ENTRY_BYTES
+        total += snap.result_rows * RESULT_CACHE_ROW_BYTES
+        return total
+
+    def close(self) -> None:
+        """drop the cached snapshot, its scorer stops once queries finish"""
+        with self._load_lock:
+            snap, self._snapshot = self._snapshot, None
+        if snap is not None:
+            snap.retire()
+
+    def _compile_aliases(self, snap: MatrixSnapshot, table: dict) -> dict[str, str]:
+        """normalize both sides, dropping aliases of columns not in the snapshot"""
+        compiled = {}
+        for phrase, symptom in table.items():
+            target = self._normalize_text(symptom)
+            if target in snap.col_index:
+                compiled[self._normalize_text(phrase)] = target
+        if len(compiled) < len(table):
+            logger.warning(
+                "%d aliases point to unknown symptoms", len(table) - len(compiled)
+            )
+        return compiled
+
+    def refresh_aliases(
+        self, snap: Optional[MatrixSnapshot] = None, force: bool = False
+    ) -> None:
+        """
+        Recompile the alias table of a snapshot if the alias file changed.
+        The file is checked at most once per alias_check_interval seconds
+        unless force is set; a file that fails to load keeps the previous
+        table until it changes again.
+        """
+        snap = snap or self.snapshot()
+        now = time.monotonic()
+        if (
+            not force
+            and snap.alias_checked is not None
+            and now - snap.alias_checked < self.alias_check_interval
+        ):
+            return
+        snap.alias_checked = now
+        if self.alias_source is None or not self.alias_source.exists():
+            snap.aliases, snap.alias_stamp = {}, None
+            return
+        st = self.alias_source.stat()
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp != snap.alias_stamp:
+            # recorded even on failure so a bad file is not parsed per request
+            snap.alias_stamp = stamp
+            try:
+                table = load_alias_table(self.alias_source)
+            except (OSError, ValueError) as e:
+                logger.warning(
+                    "keeping %d aliases, cannot load %s: %s",
+                    len(snap.aliases),
+                    self.alias_source,
+                    e,
+                )
+                return
+            snap.aliases = self._compile_aliases(snap, table)
+            logger.info("loaded %d aliases", len(snap.aliases))
+
+    def _record(self, trace: Optional[list], kind: str, token: str, col=None):
+        self.resolution_stats.record(kind, token, col)
+        if trace is not None:
+            trace.append((kind, token, col))
+
+    def _resolve_token(
+        self,
+        snap: MatrixSnapshot,
+        clean: str,
+        fuzzy_cutoff: float,
+        trace: Optional[list] = None,
+    ) -> Optional[str]:
+        """
+        normalized token -> normalized column name, fuzzy results are cached;
+        the resolution is counted in resolution_stats (and appended to trace)
+        """
+        if clean in snap.col_index:
+            self._record(trace, "exact", clean)
+            return clean
+        alias = snap.aliases.get(clean)
+        if alias is not None:
+            self._record(trace, "alias", clean)
+            return alias
+        key = (clean, fuzzy_cutoff)
+        # one lookup: another thread may evict the key between two of them
+        mapped = snap.token_cache.get(key, _MISSING)
+        if mapped is _MISSING:
+            mapped = self._fuzzy_match(clean, snap.normalized_cols, cutoff=fuzzy_cutoff)
+            with snap.cache_lock:
+                if len(snap.token_cache) >= TOKEN_CACHE_SIZE:
+                    snap.token_cache.pop(next(iter(snap.token_cache)))
+                snap.token_cache[key] = mapped
+        if mapped:
+            self._record(trace, "fuzzy", clean, snap.col_index[mapped])
+        else:
+            self._record(trace, "unmatched", clean)
+        return mapped
+
+    def parse_symptoms(
         self,
         user_symptoms: list[str],
-        min_hits: float = 1.0,
-        top_k: int = 5,
-        symptom_weights: Optional[dict[str, float]] = None,
         fuzzy_cutoff: float = 0.65,
-    ) -> list[dict]:
+        snap: Optional[MatrixSnapshot] = None,
+        trace: Optional[list] = None,
+    ) -> tuple[list[dict], list[str]]:
         """
-        Simple rule-based matcher:
-        - normalize and fuzzy-match input symptoms to dataset columns
-        - handle English negation
-        - optional symptom_weights
+        map raw inputs to columns: (parsed, unmatched); the aliases are
+        refreshed here only when no snapshot is passed in
         """
-        df, symptom_cols = self.load_matrix()
-
-        col_index = self._build_col_index(symptom_cols)
-        normalized_cols = list(col_index.keys())
-
+        if snap is None:
+            snap = self.snapshot()
+            self.refresh_aliases(snap)
         parsed = []
         unmatched = []
         negation_re = re.compile(r"\b(no|not|without|none|never)\b", flags=re.I)
@@ -94,16 +388,10 @@ class DataLoader:
             clean = negation_re.sub(" ", lower)
             clean = self._normalize_text(clean)
 
-            mapped_norm = None
-            if clean in col_index:
-                mapped_norm = clean
-            else:
-                mapped_norm = self._fuzzy_match(
-                    clean, normalized_cols, cutoff=fuzzy_cutoff
-                )
+            mapped_norm = self._resolve_token(snap, clean, fuzzy_cutoff, trace)
 
             if mapped_norm:
-                mapped_col = col_index[mapped_norm]
+                mapped_col = snap.col_index[mapped_norm]
                 parsed.append(
                     {
                         "input": raw,
@@ -114,12 +402,164 @@ class DataLoader:
                 )
             else:
                 unmatched.append(raw)
+        return parsed, unmatched
 
-        logging.info(f"parsed input -> mapped: {parsed}")
-        if unmatched:
-            logging.info(f"unmatched symptoms: {unmatched}")
+    def find_diseases_by_symptoms(
+        self,
+        user_symptoms: list[str],
+        min_hits: float = 1.0,
+        top_k: int = 5,
+        symptom_weights: Optional[dict[str, float]] = None,
+        fuzzy_cutoff: float = 0.65,
+        use_cache: bool = True,
+    ) -> list[dict]:
+        """
+        Simple rule-based matcher:
+        - normalize and fuzzy-match input symptoms to dataset columns
+        - handle English negation
+        - optional symptom_weights
+        Results without symptom_weights are cached per snapshot.
+        """
+        if top_k < 1:
+            raise ValueError("top_k must be >= 1")
+        with self.lease() as snap:
+            return self._find_cached(
+                snap,
+                user_symptoms,
+                min_hits,
+                top_k,
+                symptom_weights,
+                fuzzy_cutoff,
+                use_cache,
+            )
+
+    def _find_cached(
+        self,
+        snap: MatrixSnapshot,
+        user_symptoms: list[str],
+        min_hits: float,
+        top_k: int,
+        symptom_weights: Optional[dict[str, float]],
+        fuzzy_cutoff: float,
+        use_cache: bool,
+    ) -> list[dict]:
+        self.refresh_aliases(snap)
+        key = None
+        if use_cache:
+            key = self._result_key(
+                snap, user_symptoms, min_hits, top_k, symptom_weights, fuzzy_cutoff
+            )
+        if key is not None:
+            cached = self._cache_hit(snap, key)
+            if cached is not None:
+                return cached
+
+        trace = [] if key is not None else None
+        results = self._match(
+            snap, user_symptoms, min_hits, top_k, symptom_weights, fuzzy_cutoff, trace
+        )
+        if key is not None:
+            with snap.cache_lock:
+                if key not in snap.result_cache:
+                    snap.result_rows += len(results)
+                    snap.result_cache[key] = (results, tuple(trace))
+                if len(snap.result_cache) > RESULT_CACHE_SIZE:
+                    _, (dropped, _) = snap.result_cache.popitem(last=False)
+                    snap.result_rows -= len(dropped)
+        return list(results)
+
+    def _cache_hit(self, snap: MatrixSnapshot, key: tuple) -> Optional[list[dict]]:
+        with snap.cache_lock:
+            cached = snap.result_cache.get(key)
+            if cached is not None:
+                snap.result_cache.move_to_end(key)
+        if cached is None:
+            return None
+        logger.debug("result cache hit")
+        results, resolutions = cached
+        # count the inputs as if they had been resolved again
+        for kind, token, col in resolutions:
+            self.resolution_stats.record(kind, token, col)
+        return list(results)
+
+    def cached_result(
+        self,
+        user_symptoms: list[str],
+        min_hits: float = 1.0,
+        top_k: int = 5,
+        fuzzy_cutoff: float = 0.65,
+    ) -> Optional[list[dict]]:
+        """
+        find_diseases_by_symptoms result if it is in the result cache of the
+        current snapshot, else None; never loads or scores, cheap enough to
+        call from the event loop
+        """
+        snap = self._snapshot
+        if not self.is_current(snap) or not snap.acquire():
+            return None
+        try:
+            self.refresh_aliases(snap)
+            key = self._result_key(
+                snap, user_symptoms, min_hits, top_k, None, fuzzy_cutoff
+            )
+            return self._cache_hit(snap, key)
+        finally:
+            snap.release()
+
+    def _result_key(
+        self,
+        snap: MatrixSnapshot,
+        user_symptoms: list[str],
+        min_hits: float,
+        top_k: int,
+        symptom_weights: Optional[dict[str, float]],
+        fuzzy_cutoff: float,
+    ) -> Optional[tuple]:
+        if symptom_weights:
+            return None
+        return (
+            tuple(user_symptoms),
+            float(min_hits),
+            int(top_k),
+            float(fuzzy_cutoff),
+            snap.alias_stamp,
+        )
+
+    def suggest(self, prefix: str, limit: int = 10) -> list[str]:
+        """symptom names and aliases starting with (then containing) prefix"""
+        snap = self.snapshot()
+        self.refresh_aliases(snap)
+        token = self._normalize_text(prefix)
+        if not token:
+            return []
+        names = snap.normalized_cols + list(snap.aliases)
+        starts = [n for n in names if n.startswith(token)]
+        contains = [n for n in names if token in n and not n.startswith(token)]
+        return (sorted(starts) + sorted(contains))[:limit]
+
+    def _match(
+        self,
+        snap: MatrixSnapshot,
+        user_symptoms: list[str],
+        min_hits: float,
+        top_k: int,
+        symptom_weights: Optional[dict[str, float]],
+        fuzzy_cutoff: float,
+        trace: Optional[list] = None,
+    ) -> list[dict]:
+        df = snap.df
+        parsed, unmatched = self.parse_symptoms(
+            user_symptoms, fuzzy_cutoff, snap, trace
+        )
+
+        logger.info(
+            "parsed %d symptoms, %d unmatched",
+            len(parsed),
+            len(unmatched),
+            extra={"fields": {"parsed": parsed, "unmatched": unmatched}},
+        )
         if not parsed:
-            logging.info("no input symptoms matched to known symptom columns")
+            logger.info("no input symptoms matched to known symptom columns")
             return []
 
         weights = {}
@@ -134,6 +574,114 @@ class DataLoader:
                     w = float(symptom_weights[col])
             weights[col] = w
 
+        if snap.scorer is not None:
+            hits = self._sharded_top_k(snap, parsed, weights, min_hits, top_k)
+        else:
+            hits = self._scan_top_k(df, parsed, weights, min_hits, top_k)
+        if not hits:
+            logger.info("no diseases passed the min_hits threshold")
+            return []
+
+        results = self._build_results(df, parsed, hits)
+
+        logger.info(
+            "matched %d diseases",
+            len(results),
+            extra={"fields": {"symptoms": user_symptoms, "matched": len(results)}},
+        )
+        return results
+
+    def _build_results(
+        self, df: pd.DataFrame, parsed: list[dict], hits: list[tuple[int, float]]
+    ) -> list[dict]:
+        results = []
+        for idx, score in hits:
+            matched = []
+            for p in parsed:
+                c = p["col"]
+                val = df.at[idx, c]
+                if p["negated"]:
+                    if val == 1:
+                        matched.append(f"NOT {c}")
+                else:
+                    if val == 1:
+                        matched.append(c)
+            results.append(
+                {
+                    "disease": df.at[idx, "diseases"],
+                    "score": score,
+                    "matched_symptoms": matched,
+                }
+            )
+        return results
+
+    def find_diseases_batch(
+        self,
+        queries: list[list[dict]],
+        min_hits: float = 1.0,
+        top_k: int = 5,
+    ) -> list[list[dict]]:
+        """
+        Vectorized scoring of many already parsed queries (see parse_symptoms):
+        the queries become the columns of one weight matrix and the symptom
+        matrix is multiplied by it in row chunks of BATCH_ROW_CHUNK, keeping
+        a per-disease top-k per query. Returns one result list per query.
+        """
+        if top_k < 1:
+            raise ValueError("top_k must be >= 1")
+        with self.lease() as snap:
+            return self._score_batch(snap, queries, min_hits, top_k)
+
+    def _score_batch(
+        self,
+        snap: MatrixSnapshot,
+        queries: list[list[dict]],
+        min_hits: float,
+        top_k: int,
+    ) -> list[list[dict]]:
+        matrix, codes = self._dense(snap)
+        active = [j for j, parsed in enumerate(queries) if parsed]
+        out: list[list[dict]] = [[] for _ in queries]
+        if not active:
+            return out
+
+        used = sorted({snap.col_pos[p["col"]] for j in active for p in queries[j]})
+        used_pos = {c: i for i, c in enumerate(used)}
+        weights = np.zeros((len(used), len(active)), dtype=np.float32)
+        for k, j in enumerate(active):
+            for p in queries[j]:
+                weights[used_pos[snap.col_pos[p["col"]]], k] += (
+                    -1.0 if p["negated"] else 1.0
+                )
+
+        min_hits = float(min_hits)
+        parts: list[list[tuple]] = [[] for _ in active]
+        for lo in range(0, matrix.shape[0], BATCH_ROW_CHUNK):
+            hi = min(lo + BATCH_ROW_CHUNK, matrix.shape[0])
+            scores = matrix[lo:hi, used] @ weights
+            for k in range(len(active)):
+                col = scores[:, k]
+                local = np.flatnonzero(col >= min_hits)
+                rows = local + lo
+                parts[k].append(dedup_top_k(rows, col[local], codes[rows], top_k))
+
+        for k, j in enumerate(active):
+            rows = np.concatenate([p[0] for p in parts[k]])
+            scores = np.concatenate([p[1] for p in parts[k]])
+            rows, scores = dedup_top_k(rows, scores, codes[rows], top_k)
+            hits = list(zip(rows.tolist(), scores.astype(float).tolist()))
+            out[j] = self._build_results(snap.df, queries[j], hits)
+        return out
+
+    def _scan_top_k(
+        self,
+        df: pd.DataFrame,
+        parsed: list[dict],
+        weights: dict[str, float],
+        min_hits: float,
+        top_k: int,
+    ) -> list[tuple[int, float]]:
+        """single-threaded scan, (row, score) of the best row per disease"""
         score_series = pd.Series(0.0, index=df.index)
         for p in parsed:
             col = p["col"]
@@ -146,39 +694,40 @@ class DataLoader:
         df_scores = df[["diseases"]].copy()
         df_scores["score"] = score_series
 
+        # stable sort: ties keep row order, as in the sharded merge
         filtered = df_scores[df_scores["score"] >= float(min_hits)].sort_values(
-            "score", ascending=False
+            "score", ascending=False, kind="stable"
         )
-        if filtered.empty:
-            logging.info("no diseases passed the min_hits threshold")
-            return []
 
-        results = []
+        hits = []
         seen = set()
         for idx, row in filtered.iterrows():
             disease = row["diseases"]
             if disease in seen:
                 continue
             seen.add(disease)
-            matched = []
-            for p in parsed:
-                c = p["col"]
-                val = df.at[idx, c]
-                if p["negated"]:
-                    if val == 1:
-                        matched.append(f"NOT {c}")
-                else:
-                    if val == 1:
-                        matched.append(c)
-            results.append(
-                {
-                    "disease": disease,
-                    "score": float(row["score"]),
-                    "matched_symptoms": matched,
-                }
-            )
-            if len(results) >= top_k:
+            hits.append((idx, float(row["score"])))
+            if len(hits) >= top_k:
                 break
+        return hits
 
-        logging.info(f"matched {len(results)} diseases for symptoms: {user_symptoms}")
-        return results
+    def _sharded_top_k(
+        self,
+        snap: MatrixSnapshot,
+        parsed: list[dict],
+        weights: dict[str, float],
+        min_hits: float,
+        top_k: int,
+    ) -> list[tuple[int, float]]:
+        """sharded scan, the query becomes one signed weight per column"""
+        col_w: dict[int, float] = {}
+        for p in parsed:
+            pos = snap.col_pos[p["col"]]
+            w = weights.get(p["col"], 1.0)
+            col_w[pos] = col_w.get(pos, 0.0) + (-w if p["negated"] else w)
+        return snap.scorer.top_k(
+            np.fromiter(col_w.keys(), dtype=np.intp, count=len(col_w)),
+            np.fromiter(col_w.values(), dtype=np.float64, count=len(col_w)),
+            min_hits,
+            top_k,
+        )
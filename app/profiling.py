@@ -0,0 +1,135 @@
+"""per-call profiling and memory breakdown of a loaded DataLoader"""
+
+import cProfile
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.data_loader import DataLoader
+
+# tracemalloc is process wide, so only one call is profiled at a time
+_profile_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """another call is already being profiled in this process"""
+
+
+def profile_call(fn: Callable, *args, top: int = 20, **kwargs) -> tuple:
+    """
+    Run fn(*args, **kwargs) under cProfile and tracemalloc and return
+    (result, report) with the `top` functions by cumulative time and the
+    `top` allocation sites by size. tracemalloc sees the whole process, so
+    the allocation figures include whatever other threads (concurrent
+    requests) allocate meanwhile. If tracing is already on it is left
+    running and the report covers the difference over the call.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy("profiler busy")
+    try:
+        profiler = cProfile.Profile()
+        was_tracing = tracemalloc.is_tracing()
+        baseline, base_bytes = None, 0
+        if was_tracing:
+            baseline = tracemalloc.take_snapshot()
+            base_bytes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        else:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            result = profiler.runcall(fn, *args, **kwargs)
+        finally:
+            wall = time.perf_counter() - start
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            if not was_tracing:
+                tracemalloc.stop()
+    finally:
+        _profile_lock.release()
+
+    stats = pstats.Stats(profiler)
+    rows = sorted(stats.stats.items(), key=lambda kv: kv[1][3], reverse=True)
+    functions = [
+        {
+            "function": f"{file}:{line}({name})",
+            "calls": nc,
+            "tottime_ms": round(tt * 1000, 3),
+            "cumtime_ms": round(ct * 1000, 3),
+        }
+        for (file, line, name), (_, nc, tt, ct, _) in rows[:top]
+    ]
+    if baseline is None:
+        sites = [(s.traceback, s.size, s.count) for s in snapshot.statistics("lineno")]
+        count = sum(s.count for s in snapshot.statistics("filename"))
+    else:
+        diff = snapshot.compare_to(baseline, "lineno")
+        sites = [(s.traceback, s.size_diff, s.count_diff) for s in diff]
+        count = sum(s.count_diff for s in snapshot.compare_to(baseline, "filename"))
+    allocations = [
+        {"location": str(tb), "size_bytes": size, "count": n}
+        for tb, size, n in sites[:top]
+    ]
+    report = {
+        "wall_ms": round(wall * 1000, 3),
+        "functions": functions,
+        "allocations": {
+            "current_bytes": current - base_bytes,
+            "peak_bytes": peak - base_bytes,
+            "count": count,
+            "top": allocations,
+            "scope": "process-wide, includes concurrent requests in this worker",
+        },
+    }
+    return result, report
+
+
+def deep_sizeof(obj, seen: Optional[set] = None) -> int:
+    """size of an object including the containers and strings it holds"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        return sys.getsizeof(obj)  # includes the buffer when the array owns it
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        usage = obj.memory_usage(deep=True, index=True)
+        return int(usage.sum() if isinstance(obj, pd.DataFrame) else usage)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(x, seen) for x in obj)
+    return size
+
+
+def memory_report(loader: DataLoader) -> dict[str, int]:
+    """bytes held by each component of the loader's cached snapshot"""
+    snap = loader.snapshot()
+    df = snap.df
+    matrix = int(df[snap.symptom_cols].memory_usage(deep=True, index=False).sum())
+    dense = 0
+    if snap.matrix is not None:
+        dense += snap.matrix.nbytes + snap.codes.nbytes
+    if snap.scorer is not None:
+        dense += snap.scorer.nbytes
+    return {
+        "matrix": matrix,
+        "dense_matrix": dense,
+        "labels": int(df["diseases"].memory_usage(deep=True, index=True)),
+        "column_index": deep_sizeof(snap.col_index)
+        + deep_sizeof(snap.col_pos)
+        + deep_sizeof(snap.symptom_cols),
+        "fuzzy_index": deep_sizeof(snap.normalized_cols),
+        "alias_table": deep_sizeof(snap.aliases),
+        "token_cache": deep_sizeof(snap.token_cache),
+        "result_cache": deep_sizeof(snap.result_cache),
+        "resolution_stats": deep_sizeof(loader.resolution_stats.fuzzy)
+        + deep_sizeof(loader.resolution_stats.unmatched),
+    }
@@ -0,0 +1,161 @@
+"""named symptom matrices served side by side, loaded lazily within a memory budget"""
+
+import json
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+from app.data_loader import DataLoader
+
+logger = logging.getLogger(__name__)
+
+
+class DatasetRegistry:
+    """
+    Keeps one DataLoader (and so one snapshot with its own indexes) per
+    dataset name. A dataset is loaded on first use and pinned while a
+    request uses it (lease, or acquire/release); when the total memory of
+    loaded datasets exceeds `memory_budget` bytes the least recently used
+    unpinned ones are released. The most recently used dataset is never
+    evicted, even if it alone is over budget. Memory is re-measured on every
+    acquire and release, so it follows the caches as they fill.
+    """
+
+    def __init__(self, memory_budget: Optional[int] = None):
+        self.memory_budget = memory_budget
+        self._loaders: dict[str, DataLoader] = {}
+        # loaded datasets in LRU order: name -> (snapshot stamp, bytes)
+        self._loaded: OrderedDict[str, tuple] = OrderedDict()
+        self._stats: dict[str, dict] = {}
+        self._pins: dict[str, int] = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_config(cls, path: Path) -> "DatasetRegistry":
+        """
+        JSON config:
+        {"memory_budget_mb": 2048,
+         "datasets": {"kaggle-2023": {"path": "data/a.csv", "shards": 4}}}
+        """
+        config = json.loads(path.read_text())
+        budget_mb = config.get("memory_budget_mb")
+        registry = cls(int(budget_mb * 1024 * 1024) if budget_mb else None)
+        for name, options in config.get("datasets", {}).items():
+            options = dict(options)
+            registry.register(name, Path(options.pop("path")), **options)
+        return registry
+
+    def register(self, name: str, data_source: Path, **loader_kwargs) -> None:
+        with self._lock:
+            if name in self._loaders:
+                self.unload(name)
+            self._loaders[name] = DataLoader(data_source, **loader_kwargs)
+            self._stats[name] = {"hits": 0, "loads": 0, "evictions": 0}
+            self._pins.setdefault(name, 0)
+
+    def names(self) -> list[str]:
+        return list(self._loaders)
+
+    def loader(self, name: str) -> DataLoader:
+        """loader of a dataset without loading it; KeyError if unknown"""
+        return self._loaders[name]
+
+    def acquire(self, name: str) -> DataLoader:
+        """
+        Loader of a dataset with its snapshot loaded, pinned until
+        release(name); KeyError if unknown. The file is read outside the
+        registry lock but still blocks, so call it off the event loop.
+        """
+        with self._lock:
+            loader = self._loaders[name]
+            self._pins[name] += 1
+        try:
+            snap = loader.snapshot()
+        except BaseException:
+            with self._lock:
+                self._pins[name] -= 1
+            raise
+        with self._lock:
+            stats = self._stats[name]
+            if self._loaded.get(name, (None,))[0] == snap.stamp:
+                stats["hits"] += 1
+            else:
+                stats["loads"] += 1
+            self._loaded[name] = (snap.stamp, loader.memory_bytes())
+            self._loaded.move_to_end(name)
+            self._evict()
+        return loader
+
+    def acquire_loaded(self, name: str) -> Optional[DataLoader]:
+        """
+        acquire(name) if the dataset is loaded and its snapshot is current,
+        else None; never reads the data file, so it can run on the event loop
+        """
+        loader = self._loaders[name]
+        if not loader.is_current():
+            return None
+        with self._lock:
+            if name not in self._loaded or self._loaders.get(name) is not loader:
+                return None
+            self._pins[name] += 1
+            self._stats[name]["hits"] += 1
+            self._loaded.move_to_end(name)
+        return loader
+
+    def release(self, name: str) -> None:
+        """unpin a dataset, re-measure it and evict if over budget"""
+        with self._lock:
+            self._pins[name] -= 1
+            if name in self._loaded:
+                stamp, _ = self._loaded[name]
+                self._loaded[name] = (stamp, self._loaders[name].memory_bytes())
+            self._evict()
+
+    @contextmanager
+    def lease(self, name: str) -> Iterator[DataLoader]:
+        """acquire(name) for the duration of the block"""
+        loader = self.acquire(name)
+        try:
+            yield loader
+        finally:
+            self.release(name)
+
+    def unload(self, name: str) -> None:
+        with self._lock:
+            if self._loaded.pop(name, None) is not None:
+                self._loaders[name].close()
+
+    def _evict(self) -> None:
+        while self.memory_budget is not None and self.total_bytes() > (
+            self.memory_budget
+        ):
+            names = list(self._loaded)[:-1]  # never the most recently used
+            victim = next((n for n in names if not self._pins[n]), None)
+            if victim is None:
+                break
+            logger.info("evicting dataset %s", victim)
+            self.unload(victim)
+            self._stats[victim]["evictions"] += 1
+
+    def total_bytes(self) -> int:
+        return sum(size for _, size in self._loaded.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "memory_budget": self.memory_budget,
+                "memory_bytes": self.total_bytes(),
+                "datasets": {
+                    name: {
+                        "path": str(loader.data_source),
+                        "loaded": name in self._loaded,
+                        "in_use": self._pins[name],
+                        "memory_bytes": self._loaded.get(name, (None, 0))[1],
+                        **self._stats[name],
+                    }
+                    for name, loader in self._loaders.items()
+                },
+            }
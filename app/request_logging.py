@@ -0,0 +1,145 @@
+"""structured request logging handed off to a background writer thread"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+import zlib
+from typing import Optional, TextIO
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "request_id", default=None
+)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional["DeferredQueueHandler"] = None
+
+# keys set by JsonFormatter itself, caller fields cannot overwrite them
+RESERVED_KEYS = frozenset({"ts", "level", "logger", "msg", "request_id", "exc"})
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Tags records with the current request id and samples requests:
+    all records of a sampled request are kept (the decision is a hash of
+    the request id), warnings and errors are always kept.
+    """
+
+    def __init__(self, sample_rate: float = 1.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rid = request_id_var.get()
+        record.request_id = rid
+        if self.sample_rate >= 1.0 or record.levelno >= logging.WARNING:
+            return True
+        if rid is None:
+            return random.random() < self.sample_rate
+        return zlib.crc32(rid.encode()) % 10_000 < self.sample_rate * 10_000
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    one JSON object per record, structured data comes from extra={"fields"}
+    (fields named like RESERVED_KEYS are skipped)
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            out.update((k, v) for k, v in fields.items() if k not in RESERVED_KEYS)
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread (the stock
+    prepare() renders the message on the caller's thread) and drops records
+    instead of blocking when the queue is full, counting them in `dropped`.
+    """
+
+    def __init__(self, queue_: queue.Queue):
+        super().__init__(queue_)
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+
+def configure_logging(
+    level: str = "INFO",
+    sample_rate: float = 1.0,
+    stream: Optional[TextIO] = None,
+    max_queue: int = 10_000,
+    loggers: tuple[str, ...] = ("app", "main"),
+) -> logging.handlers.QueueListener:
+    """
+    Route the app loggers through a bounded queue to a background thread
+    writing JSON lines to `stream` (stderr by default). Calling it again
+    replaces the previous configuration.
+    """
+    global _listener, _handler
+    shutdown_logging()
+
+    writer = logging.StreamHandler(stream or sys.stderr)
+    writer.setFormatter(JsonFormatter())
+    _handler = DeferredQueueHandler(queue.Queue(max_queue))
+    _handler.addFilter(RequestContextFilter(sample_rate))
+    for name in loggers:
+        logger = logging.getLogger(name)
+        logger.setLevel(level)
+        logger.addHandler(_handler)
+        logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(_handler.queue, writer)
+    _listener.start()
+    return _listener
+
+
+def dropped_records() -> int:
+    """records dropped on a full queue since configure_logging()"""
+    return _handler.dropped if _handler is not None else 0
+
+
+def shutdown_logging() -> None:
+    """flush pending records and detach the queue handler"""
+    global _listener, _handler
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _handler is not None:
+        for logger in logging.Logger.manager.loggerDict.values():
+            if isinstance(logger, logging.Logger) and _handler in logger.handlers:
+                logger.removeHandler(_handler)
+                logger.propagate = True
+        dropped, _handler = _handler.dropped, None
+        if dropped:
+            logging.getLogger(__name__).warning(
+                "dropped %d log records on a full queue", dropped
+            )
+
+
+atexit.register(shutdown_logging)
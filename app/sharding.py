@@ -0,0 +1,188 @@
+"""sharded top-k scoring of the symptom matrix across a worker pool"""
+
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from typing import Optional
+
+import numpy as np
+
+EXECUTORS = ("process", "thread")
+
+# per-process cache of attached shared memory blocks: name -> SharedMemory
+_ATTACHED: dict[str, shared_memory.SharedMemory] = {}
+
+
+def _attach(name: str, shape: tuple, dtype: str, order: str = "C") -> np.ndarray:
+    """view a shared memory block as an array (attached once per process)"""
+    shm = _ATTACHED.get(name)
+    if shm is None:
+        shm = shared_memory.SharedMemory(name=name)
+        _ATTACHED[name] = shm
+    return np.ndarray(shape, dtype=dtype, buffer=shm.buf, order=order)
+
+
+def _mp_context() -> multiprocessing.context.BaseContext:
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context(
+        "forkserver" if "forkserver" in methods else "spawn"
+    )
+
+
+def dedup_top_k(
+    rows: np.ndarray, scores: np.ndarray, codes: np.ndarray, top_k: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """best row per disease, ordered by score desc then row asc, cut to top_k"""
+    if rows.size == 0:
+        return rows, scores
+    order = np.lexsort((rows, -scores))
+    rows, scores, codes = rows[order], scores[order], codes[order]
+    _, first = np.unique(codes, return_index=True)
+    keep = np.sort(first)[:top_k]
+    return rows[keep], scores[keep]
+
+
+def score_shard(
+    matrix: np.ndarray,
+    codes: np.ndarray,
+    lo: int,
+    hi: int,
+    col_idx: np.ndarray,
+    col_w: np.ndarray,
+    min_hits: float,
+    top_k: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """score rows [lo, hi) and return the shard's partial top-k (global rows)"""
+    scores = matrix[lo:hi, col_idx] @ col_w
+    local = np.flatnonzero(scores >= min_hits)
+    rows = local + lo
+    return dedup_top_k(rows, scores[local], codes[rows], top_k)
+
+
+def _score_shared_shard(meta: dict, lo, hi, col_idx, col_w, min_hits, top_k):
+    """process pool entry point: attach to the shared matrix and score a shard"""
+    matrix = _attach(meta["matrix"], meta["shape"], meta["dtype"], order="F")
+    codes = _attach(meta["codes"], (meta["shape"][0],), meta["codes_dtype"])
+    return score_shard(matrix, codes, lo, hi, col_idx, col_w, min_hits, top_k)
+
+
+class ShardedScorer:
+    """
+    Splits the row space of a dense symptom matrix into contiguous shards
+    and scores a query on a pool of workers:
+    - "process": matrix and disease codes live in shared memory, shards
+      are scored by a ProcessPoolExecutor without copying the matrix
+    - "thread": shards are scored by a ThreadPoolExecutor, relying on
+      NumPy releasing the GIL inside the gather/matmul kernels
+    Per-shard partial top-k lists (deduplicated per disease) are merged
+    into the global top-k.
+    """
+
+    def __init__(
+        self,
+        matrix: np.ndarray,
+        codes: np.ndarray,
+        shards: int = 1,
+        workers: Optional[int] = None,
+        executor: str = "process",
+    ):
+        if executor not in EXECUTORS:
+            raise ValueError(f"unknown executor: {executor!r}")
+        if shards < 1:
+            raise ValueError("shards must be >= 1")
+        n_rows = matrix.shape[0]
+        self.shards = max(1, min(shards, n_rows or 1))
+        self.workers = workers or min(self.shards, os.cpu_count() or 1)
+        self.executor = executor
+        bounds = np.linspace(0, n_rows, self.shards + 1).astype(int)
+        self.bounds = list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+        self._shm: list[shared_memory.SharedMemory] = []
+        self._pool: Optional[Executor] = None
+        self._closed = False
+        if executor == "process":
+            self.matrix = self._share(np.asfortranarray(matrix), order="F")
+            self.codes = self._share(np.ascontiguousarray(codes))
+            self._meta = {
+                "matrix": self._shm[0].name,
+                "shape": self.matrix.shape,
+                "dtype": self.matrix.dtype.str,
+                "codes": self._shm[1].name,
+                "codes_dtype": self.codes.dtype.str,
+            }
+        else:
+            self.matrix = np.asfortranarray(matrix)
+            self.codes = np.ascontiguousarray(codes)
+
+    def _share(self, arr: np.ndarray, order: str = "C") -> np.ndarray:
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        self._shm.append(shm)
+        view = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf, order=order)
+        view[...] = arr
+        return view
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.executor == "process":
+                # workers attach to shared memory by name and inherit nothing,
+                # so avoid forking the (multi-threaded) server process
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=_mp_context()
+                )
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.matrix.nbytes + self.codes.nbytes)
+
+    def top_k(
+        self,
+        col_idx: np.ndarray,
+        col_w: np.ndarray,
+        min_hits: float,
+        top_k: int,
+    ) -> list[tuple[int, float]]:
+        """global top-k (row, score) pairs, at most one row per disease"""
+        if self._closed:
+            raise RuntimeError("scorer is closed")
+        if top_k < 1:
+            raise ValueError("top_k must be >= 1")
+        col_idx = np.asarray(col_idx, dtype=np.intp)
+        col_w = np.asarray(col_w, dtype=np.float64)
+        min_hits = float(min_hits)
+        args = (col_idx, col_w, min_hits, top_k)
+        if self.shards == 1:
+            n_rows = self.matrix.shape[0]
+            parts = [score_shard(self.matrix, self.codes, 0, n_rows, *args)]
+        else:
+            if self.executor == "process":
+                fn, data = _score_shared_shard, (self._meta,)
+            else:
+                fn, data = score_shard, (self.matrix, self.codes)
+            pool = self._get_pool()
+            futures = [pool.submit(fn, *data, lo, hi, *args) for lo, hi in self.bounds]
+            parts = [f.result() for f in futures]
+
+        rows = np.concatenate([p[0] for p in parts])
+        scores = np.concatenate([p[1] for p in parts])
+        rows, scores = dedup_top_k(rows, scores, self.codes[rows], top_k)
+        return list(zip(rows.tolist(), scores.tolist()))
+
+    def close(self) -> None:
+        """shut the pool down and release shared memory"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        # drop the views before closing, the buffers must not be exported
+        self.matrix = np.empty((0, self.matrix.shape[1]), dtype=self.matrix.dtype)
+        self.codes = np.empty(0, dtype=self.codes.dtype)
+        for shm in self._shm:
+            shm.close()
+            shm.unlink()
+        self._shm = []
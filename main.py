@@ -1,16 +1,149 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
 from pathlib import Path
+import logging
+import os
+import time
+import uuid
+from app.admission import HIGH, LOW, AdmissionController, Overloaded
 from app.data_loader import DataLoader
-from pydantic import BaseModel
+from app.profiling import ProfilerBusy, profile_call
+from app.registry import DatasetRegistry
+from app.request_logging import (
+    configure_logging,
+    dropped_records,
+    request_id_var,
+    shutdown_logging,
+)
+from pydantic import BaseModel, Field
+from typing import Optional
 
-app = FastAPI(title="Medical Chatbot API")
+logger = logging.getLogger("main")
 
-data_loader = DataLoader(Path("data/symptom_matrix.csv"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """request logs go through a queue to a background writer (see LOG_* env)"""
+    configure_logging(
+        level=os.environ.get("LOG_LEVEL", "INFO"),
+        sample_rate=float(os.environ.get("LOG_SAMPLE_RATE", "1.0")),
+    )
+    yield
+    shutdown_logging()
+
+
+app = FastAPI(title="Medical Chatbot API", lifespan=lifespan)
+
+# dataset used by requests that do not name one
+DEFAULT_DATASET = "default"
+
+
+def _build_registry() -> DatasetRegistry:
+    """
+    The default dataset (data/symptom_matrix.csv) plus extra named datasets
+    from DATASETS_CONFIG (default data/datasets.json), which may also
+    override "default". For the default dataset SCORER_SHARDS > 1 scores the
+    matrix in row shards on SCORER_WORKERS workers, SCORER_EXECUTOR
+    "process" (shared memory) or "thread".
+    """
+    config = Path(os.environ.get("DATASETS_CONFIG", "data/datasets.json"))
+    if config.exists():
+        registry = DatasetRegistry.from_config(config)
+    else:
+        registry = DatasetRegistry()
+    if DEFAULT_DATASET not in registry.names():
+        registry.register(
+            DEFAULT_DATASET,
+            Path("data/symptom_matrix.csv"),
+            shards=int(os.environ.get("SCORER_SHARDS", "1")),
+            workers=int(os.environ.get("SCORER_WORKERS", "0")) or None,
+            executor=os.environ.get("SCORER_EXECUTOR", "process"),
+            alias_source=Path(os.environ.get("SYMPTOM_ALIASES", "data/aliases.json")),
+        )
+    return registry
+
+
+registry = _build_registry()
+
+# ?profile=1 / X-Debug-Profile: 1 on /find-diseases, only if ENABLE_PROFILING=1
+profiling_enabled = os.environ.get("ENABLE_PROFILING", "0") == "1"
+
+# per worker process: ADMISSION_CONCURRENCY scans at once, ADMISSION_QUEUE
+# waiting, shed with 503 when the wait would exceed ADMISSION_DEADLINE_S
+admission = AdmissionController(
+    max_concurrency=int(
+        os.environ.get("ADMISSION_CONCURRENCY", str(os.cpu_count() or 1))
+    ),
+    max_queue=int(os.environ.get("ADMISSION_QUEUE", "64")),
+    deadline=float(os.environ.get("ADMISSION_DEADLINE_S", "5.0")),
+)
+
+
+def get_loader(dataset: Optional[str]) -> DataLoader:
+    """registry loader of a dataset (DEFAULT_DATASET if None), not loaded"""
+    dataset = dataset or DEFAULT_DATASET
+    try:
+        return registry.loader(dataset)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"unknown dataset: {dataset}")
+
+
+@asynccontextmanager
+async def use_loader(dataset: Optional[str]):
+    """get_loader(dataset) pinned (not evicted) until the block exits,
+    loaded off the event loop unless already current"""
+    dataset = dataset or DEFAULT_DATASET
+    get_loader(dataset)  # 404 for unknown names
+    loader = registry.acquire_loaded(dataset)
+    if loader is None:
+        loader = await run_in_threadpool(registry.acquire, dataset)
+    try:
+        yield loader
+    finally:
+        registry.release(dataset)
 
 
 class SymptomsRequest(BaseModel):
     symptoms: list[str]
-    top_k: int = 5
+    top_k: int = Field(5, ge=1)
+    dataset: Optional[str] = None
+
+
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    """per-request id (X-Request-ID) attached to every log record"""
+    rid = request.headers.get("x-request-id") or uuid.uuid4().hex
+    token = request_id_var.set(rid)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+        logger.info(
+            "%s %s -> %d",
+            request.method,
+            request.url.path,
+            response.status_code,
+            extra={
+                "fields": {
+                    "status": response.status_code,
+                    "ms": round((time.perf_counter() - start) * 1000, 2),
+                }
+            },
+        )
+        response.headers["X-Request-ID"] = rid
+        return response
+    finally:
+        request_id_var.reset(token)
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"server overloaded: {exc.reason}"},
+        headers={"Retry-After": str(int(exc.retry_after))},
+    )
 
 
 @app.get("/")
@@ -22,7 +155,7 @@ def root():
 def test_connection():
     """checks if the data file is accessible"""
     try:
-        df, symptom_cols = data_loader.load_matrix()
+        df, symptom_cols = get_loader(None).load_matrix()
         return {
             "status": "OK",
             "diseases_count": len(df),
@@ -39,17 +172,51 @@ def test_connection():
 
 
 @app.post("/find-diseases")
-async def find_diseases(request: SymptomsRequest):
+async def find_diseases(
+    request: SymptomsRequest, http_request: Request, profile: bool = False
+):
     """searches for diseases based on the provided symptoms"""
+    profile = profile or http_request.headers.get("x-debug-profile") == "1"
+    if profile and not profiling_enabled:
+        raise HTTPException(status_code=403, detail="profiling is disabled")
     try:
-        results = data_loader.find_diseases_by_symptoms(
-            request.symptoms, min_hits=1, top_k=request.top_k
-        )
-        return {
+        async with use_loader(request.dataset) as loader:
+            # result cache hits are served inline, without a slot or a thread
+            results = None
+            if not profile:
+                results = loader.cached_result(
+                    request.symptoms, min_hits=1, top_k=request.top_k
+                )
+            if results is None:
+                async with admission.admit(LOW):
+                    if profile:
+                        results, report = await run_in_threadpool(
+                            profile_call,
+                            loader.find_diseases_by_symptoms,
+                            request.symptoms,
+                            min_hits=1,
+                            top_k=request.top_k,
+                            use_cache=False,
+                        )
+                    else:
+                        results = await run_in_threadpool(
+                            loader.find_diseases_by_symptoms,
+                            request.symptoms,
+                            min_hits=1,
+                            top_k=request.top_k,
+                        )
+        response = {
             "query_symptoms": request.symptoms,
             "found_diseases": len(results),
             "diseases": results,
         }
+        if profile:
+            response["profile"] = report
+        return response
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except (HTTPException, Overloaded):
+        raise
     except FileNotFoundError:
         raise HTTPException(
             status_code=404,
@@ -57,3 +224,42 @@ async def find_diseases(request: SymptomsRequest):
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/symptoms/suggest")
+async def suggest_symptoms(q: str, limit: int = 10, dataset: Optional[str] = None):
+    """autocomplete over symptom names and aliases"""
+    try:
+        async with use_loader(dataset) as loader:
+            async with admission.admit(HIGH):
+                suggestions = await run_in_threadpool(loader.suggest, q, limit)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=404,
+            detail="There is no data file. Run: python scripts/fetch_kaggle_data.py",
+        )
+    return {"query": q, "suggestions": suggestions}
+
+
+@app.get("/admission/stats")
+def admission_stats():
+    """admitted, queued and shed request counts of this worker"""
+    return admission.stats()
+
+
+@app.get("/logging/stats")
+def logging_stats():
+    """request log records dropped by this worker because the queue was full"""
+    return {"dropped": dropped_records()}
+
+
+@app.get("/datasets")
+def datasets():
+    """registered datasets with their memory use and hit/load/eviction counts"""
+    return registry.stats()
+
+
+@app.get("/aliases/misses")
+def alias_misses(limit: int = 50, dataset: Optional[str] = None):
+    """most frequent inputs that fell through to fuzzy matching or did not match"""
+    return get_loader(dataset).resolution_stats.top_misses(limit)
@@ -0,0 +1,86 @@
+"""benchmark of sharded scoring: scaling from 1 to N workers"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from app.sharding import ShardedScorer
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+def make_matrix(n_rows: int, n_cols: int, n_diseases: int, density: float):
+    rng = np.random.default_rng(0)
+    matrix = (rng.random((n_rows, n_cols), dtype=np.float32) < density).astype(
+        np.float32
+    )
+    codes = rng.integers(0, n_diseases, size=n_rows)
+    return matrix, codes
+
+
+def make_queries(n_queries: int, n_cols: int, per_query: int = 4):
+    rng = np.random.default_rng(1)
+    queries = []
+    for _ in range(n_queries):
+        cols = rng.choice(n_cols, size=per_query, replace=False)
+        queries.append((cols, np.ones(per_query)))
+    return queries
+
+
+def bench(scorer: ShardedScorer, queries: list, min_hits: float, top_k: int):
+    scorer.top_k(*queries[0], min_hits, top_k)  # warm up the pool
+    start = time.perf_counter()
+    for cols, w in queries:
+        scorer.top_k(cols, w, min_hits, top_k)
+    elapsed = time.perf_counter() - start
+    return elapsed / len(queries)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--cols", type=int, default=377)
+    parser.add_argument("--diseases", type=int, default=773)
+    parser.add_argument("--density", type=float, default=0.02)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--executor", choices=["process", "thread"], default="process")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--min-hits", type=float, default=1.0)
+    args = parser.parse_args()
+
+    logging.info("building %d x %d matrix", args.rows, args.cols)
+    matrix, codes = make_matrix(args.rows, args.cols, args.diseases, args.density)
+    queries = make_queries(args.queries, args.cols)
+
+    workers = 1
+    counts = []
+    while workers < args.max_workers:
+        counts.append(workers)
+        workers *= 2
+    counts.append(args.max_workers)
+
+    print(f"\n{'workers':>8} {'shards':>8} {'ms/query':>10} {'speedup':>8}")
+    baseline = None
+    for n in counts:
+        scorer = ShardedScorer(
+            matrix, codes, shards=n, workers=n, executor=args.executor
+        )
+        try:
+            per_query = bench(scorer, queries, args.min_hits, args.top_k)
+        finally:
+            scorer.close()
+        baseline = baseline or per_query
+        print(f"{n:>8} {n:>8} {per_query * 1000:>10.2f} {baseline / per_query:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""offline bulk scoring of symptom records against the symptom matrix
+
+Reads queries from JSONL ({"id": ..., "symptoms": [...]}) or CSV (columns
+id, symptoms; symptoms separated by ';'), resolves every distinct token once
+in the parent process, scores batches on a pool of worker processes and
+streams the results in input order to JSONL or Parquet (a directory of part
+files, needs pyarrow). Progress is checkpointed so an interrupted run can be
+continued with --resume.
+"""
+
+import argparse
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Iterator, Optional
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from app.data_loader import DataLoader
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+_LOADER: Optional[DataLoader] = None
+
+
+def read_queries(
+    path: Path, id_field: str = "id", symptoms_field: str = "symptoms"
+) -> Iterator[tuple[object, list[str]]]:
+    """stream (id, symptoms) records from a JSONL or CSV file"""
+    with path.open(newline="", encoding="utf-8") as f:
+        if path.suffix.lower() == ".csv":
+            for n, row in enumerate(csv.DictReader(f)):
+                raw = row.get(symptoms_field) or ""
+                symptoms = [s.strip() for s in raw.split(";") if s.strip()]
+                yield row.get(id_field, n), symptoms
+        else:
+            n = 0
+            for line in f:
+                if not line.strip():
+                    continue
+                rec = json.loads(line)
+                yield rec.get(id_field, n), list(rec.get(symptoms_field) or [])
+                n += 1
+
+
+class JsonlSink:
+    """results as JSON lines; a checkpoint is the committed byte offset"""
+
+    def __init__(self, path: Path, state: Optional[dict] = None):
+        self.path = path
+        if state and not path.exists():
+            raise RuntimeError(
+                f"cannot resume: output {path} is missing, rerun without --resume"
+            )
+        self.f = path.open("r+b" if state else "wb")
+        if state:
+            self.f.truncate(state["offset"])
+            self.f.seek(state["offset"])
+
+    def write(self, rows: list[dict]) -> None:
+        for row in rows:
+            self.f.write(json.dumps(row).encode("utf-8") + b"\n")
+
+    def commit(self) -> dict:
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        return {"offset": self.f.tell()}
+
+    def close(self) -> None:
+        self.f.close()
+
+
+class ParquetSink:
+    """results as part files in a directory; a checkpoint closes a part"""
+
+    def __init__(self, path: Path, state: Optional[dict] = None):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("Parquet output requires pyarrow") from e
+        self.pa, self.pq = pa, pq
+        # fixed so parts with only empty `unmatched` lists stay readable together
+        self.schema = pa.schema(
+            [
+                ("id", pa.string()),
+                ("diseases", pa.string()),
+                ("unmatched", pa.list_(pa.string())),
+            ]
+        )
+        self.path = path
+        self.parts = state["parts"] if state else 0
+        for n in range(self.parts):
+            if not (path / f"part-{n:05d}.parquet").exists():
+                raise RuntimeError(
+                    f"cannot resume: part {n} of {path} is missing, "
+                    "rerun without --resume"
+                )
+        path.mkdir(parents=True, exist_ok=True)
+        for part in path.glob("part-*.parquet"):
+            if int(part.stem.split("-")[1]) >= self.parts:
+                part.unlink()
+        self.writer = None
+
+    def write(self, rows: list[dict]) -> None:
+        table = self.pa.Table.from_pylist(
+            [
+                {
+                    "id": str(r["id"]),
+                    "diseases": json.dumps(r["diseases"]),
+                    "unmatched": r["unmatched"],
+                }
+                for r in rows
+            ],
+            schema=self.schema,
+        )
+        if self.writer is None:
+            part = self.path / f"part-{self.parts:05d}.parquet"
+            self.writer = self.pq.ParquetWriter(part, self.schema)
+        self.writer.write_table(table)
+
+    def commit(self) -> dict:
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+            self.parts += 1
+        return {"parts": self.parts}
+
+    def close(self) -> None:
+        self.commit()
+
+
+def _init_worker(data_source: str) -> None:
+    global _LOADER
+    if _LOADER is None:  # already inherited from the parent when forked
+        _LOADER = DataLoader(Path(data_source))
+        _LOADER.snapshot()
+
+
+def _score_batch(parsed: list[list[dict]], min_hits: float, top_k: int):
+    return _LOADER.find_diseases_batch(parsed, min_hits=min_hits, top_k=top_k)
+
+
+def load_checkpoint(path: Path) -> Optional[dict]:
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def save_checkpoint(path: Path, state: dict) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(state))
+    os.replace(tmp, path)
+
+
+def run(args: argparse.Namespace) -> dict:
+    global _LOADER
+    _LOADER = DataLoader(Path(args.data), alias_source=args.aliases)
+    snap = _LOADER.snapshot()
+    _LOADER.refresh_aliases(snap)  # one alias table for the whole run
+
+    ckpt_path = Path(args.checkpoint or f"{args.output}.ckpt")
+    ckpt = load_checkpoint(ckpt_path) if args.resume else None
+    if ckpt and ckpt.get("matrix_stamp") != list(snap.stamp):
+        raise RuntimeError("symptom matrix changed since the checkpoint was taken")
+    done = ckpt["records"] if ckpt else 0
+
+    out = Path(args.output)
+    sink_cls = ParquetSink if out.suffix.lower() == ".parquet" else JsonlSink
+    sink = sink_cls(out, ckpt["sink"] if ckpt else None)
+
+    records = islice(
+        read_queries(Path(args.input), args.id_field, args.symptoms_field),
+        done,
+        None,
+    )
+    if done:
+        logging.info("resuming after %d records", done)
+
+    start = time.perf_counter()
+    scored = 0
+    since_ckpt = 0
+
+    def flush(ids, unmatched, results) -> None:
+        nonlocal scored, since_ckpt
+        sink.write(
+            [
+                {"id": i, "diseases": r, "unmatched": u}
+                for i, u, r in zip(ids, unmatched, results)
+            ]
+        )
+        scored += len(ids)
+        since_ckpt += len(ids)
+        if since_ckpt >= args.checkpoint_every:
+            save_checkpoint(
+                ckpt_path,
+                {
+                    "records": done + scored,
+                    "sink": sink.commit(),
+                    "matrix_stamp": list(snap.stamp),
+                },
+            )
+            since_ckpt = 0
+            rate = scored / (time.perf_counter() - start)
+            logging.info("%d records scored, %.0f records/s", done + scored, rate)
+
+    # build the dense arrays before forking so the workers share their pages
+    # instead of each converting its own copy of the matrix
+    _LOADER._dense(snap)
+    fork = "fork" in multiprocessing.get_all_start_methods()
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=multiprocessing.get_context("fork") if fork else None,
+        initializer=_init_worker,
+        initargs=(str(args.data),),
+    ) as pool:
+        pending = deque()
+        while True:
+            batch = list(islice(records, args.batch_size))
+            if batch:
+                ids = [rec_id for rec_id, _ in batch]
+                parsed, unmatched = [], []
+                for _, symptoms in batch:
+                    p, u = _LOADER.parse_symptoms(symptoms, args.fuzzy_cutoff, snap)
+                    parsed.append(p)
+                    unmatched.append(u)
+                future = pool.submit(_score_batch, parsed, args.min_hits, args.top_k)
+                pending.append((ids, unmatched, future))
+            # keep at most 2 batches per worker in flight, results in input order
+            while pending and (not batch or len(pending) > 2 * args.workers):
+                ids, unmatched, future = pending.popleft()
+                flush(ids, unmatched, future.result())
+            if not batch:
+                break
+
+    save_checkpoint(
+        ckpt_path,
+        {
+            "records": done + scored,
+            "sink": sink.commit(),
+            "matrix_stamp": list(snap.stamp),
+        },
+    )
+    sink.close()
+    if args.misses_out:
+        n = _LOADER.resolution_stats.export(Path(args.misses_out))
+        logging.info("wrote %d alias candidates to %s", n, args.misses_out)
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        "records": done + scored,
+        "scored": scored,
+        "seconds": round(elapsed, 3),
+        "records_per_second": round(scored / elapsed, 1) if elapsed else 0.0,
+        "distinct_fuzzy_tokens": len(snap.token_cache),
+    }
+    logging.info("done: %s", stats)
+    return stats
+
+
+def main(argv: Optional[list[str]] = None) -> dict:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("input", help="queries, .jsonl or .csv")
+    parser.add_argument("output", help="results, .jsonl or .parquet (directory)")
+    parser.add_argument("--data", default="data/symptom_matrix.csv")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--min-hits", type=float, default=1.0)
+    parser.add_argument("--fuzzy-cutoff", type=float, default=0.65)
+    parser.add_argument("--aliases", help="alias table, .json or .csv")
+    parser.add_argument("--misses-out", help="write top fuzzy/unmatched inputs (CSV)")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--symptoms-field", default="symptoms")
+    parser.add_argument("--checkpoint", help="default: <output>.ckpt")
+    parser.add_argument("--checkpoint-every", type=int, default=50_000)
+    parser.add_argument("--resume", action="store_true")
+    return run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
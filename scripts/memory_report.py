@@ -0,0 +1,77 @@
+"""memory footprint of a loaded DataLoader snapshot, by component"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Optional
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from app.data_loader import DataLoader
+from app.profiling import memory_report
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+def process_rss() -> Optional[int]:
+    """resident set size of this process in bytes (Linux only)"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except OSError:
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def main(argv: Optional[list[str]] = None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--data", default="data/symptom_matrix.csv")
+    parser.add_argument("--aliases", default="data/aliases.json")
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument(
+        "--warm",
+        action="append",
+        default=[],
+        help="comma separated query run before measuring (fills the caches)",
+    )
+    parser.add_argument("--batch", action="store_true", help="build dense matrix")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    loader = DataLoader(
+        Path(args.data),
+        shards=args.shards,
+        executor="thread",
+        alias_source=Path(args.aliases),
+    )
+    try:
+        for query in args.warm:
+            loader.find_diseases_by_symptoms([s for s in query.split(",") if s])
+        if args.batch:
+            loader.find_diseases_batch([])
+        report = memory_report(loader)
+    finally:
+        loader.close()
+
+    total = sum(report.values())
+    rss = process_rss()
+    if args.json:
+        print(json.dumps({"components": report, "total": total, "rss": rss}))
+        return report
+
+    print(f"\n{'component':<18} {'MiB':>10} {'share':>7}")
+    for name, size in sorted(report.items(), key=lambda kv: kv[1], reverse=True):
+        share = 100 * size / total if total else 0.0
+        print(f"{name:<18} {size / 2**20:>10.2f} {share:>6.1f}%")
+    print(f"{'total':<18} {total / 2**20:>10.2f}")
+    if rss is not None:
+        print(f"{'process rss':<18} {rss / 2**20:>10.2f}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
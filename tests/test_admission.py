@@ -0,0 +1,107 @@
+import asyncio
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from app.admission import HIGH, LOW, AdmissionController, Overloaded
+
+
+async def _hold(controller, priority, started, release, order, name):
+    async with controller.admit(priority):
+        order.append(name)
+        started.set()
+        await release.wait()
+
+
+def test_priority_queue_and_queue_full():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=2, deadline=5)
+        release = asyncio.Event()
+        order = []
+        first = asyncio.Event()
+        tasks = [
+            asyncio.create_task(_hold(controller, LOW, first, release, order, "a"))
+        ]
+        await first.wait()
+        for priority, name in ((LOW, "low"), (HIGH, "high")):
+            tasks.append(
+                asyncio.create_task(
+                    _hold(controller, priority, asyncio.Event(), release, order, name)
+                )
+            )
+        await asyncio.sleep(0)
+        assert controller.stats()["waiting"] == 2
+
+        with pytest.raises(Overloaded) as exc:
+            async with controller.admit(LOW):
+                pass
+        assert exc.value.retry_after >= 1
+
+        release.set()
+        await asyncio.gather(*tasks)
+        return controller, order
+
+    controller, order = asyncio.run(scenario())
+    assert order == ["a", "high", "low"]
+    stats = controller.stats()
+    assert stats["admitted"] == 3 and stats["queued"] == 2
+    assert stats["shed_queue_full"] == 1 and stats["running"] == 0
+
+
+def test_shed_when_deadline_would_be_missed():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, deadline=0.5)
+        controller.service_time = 10.0
+        async with controller.admit():
+            with pytest.raises(Overloaded):
+                async with controller.admit():
+                    pass
+            controller.service_time = 0.01
+            with pytest.raises(Overloaded):
+                async with controller.admit(deadline=0.05):
+                    pass
+        return controller
+
+    stats = asyncio.run(scenario()).stats()
+    assert stats["shed_deadline"] == 1 and stats["timed_out"] == 1
+    assert stats["shed"] == 2 and stats["running"] == 0
+
+
+def test_overloaded_returns_503(tmp_path):
+    csv = tmp_path / "symptom_matrix.csv"
+    pd.DataFrame([{"diseases": "Flu", "fever": 1}]).to_csv(csv, index=False)
+    main.registry.register(main.DEFAULT_DATASET, csv)
+    main.admission = AdmissionController(max_concurrency=1, max_queue=0)
+    main.admission.running = 1  # the only slot is busy
+    client = TestClient(main.app)
+    try:
+        r = client.post("/find-diseases", json={"symptoms": ["fever"]})
+        assert r.status_code == 503
+        assert int(r.headers["Retry-After"]) >= 1
+        assert client.get("/admission/stats").json()["shed"] == 1
+    finally:
+        main.admission = AdmissionController()
+
+    r = client.get("/symptoms/suggest", params={"q": "fev"})
+    assert r.json()["suggestions"] == ["fever"]
+
+
+def test_cache_hits_bypass_admission(tmp_path):
+    csv = tmp_path / "symptom_matrix.csv"
+    pd.DataFrame([{"diseases": "Flu", "fever": 1}]).to_csv(csv, index=False)
+    main.registry.register(main.DEFAULT_DATASET, csv)
+    client = TestClient(main.app)
+    first = client.post("/find-diseases", json={"symptoms": ["fever"]})
+    assert first.status_code == 200
+
+    main.admission = AdmissionController(max_concurrency=1, max_queue=0)
+    main.admission.running = 1  # the only slot is busy
+    try:
+        r = client.post("/find-diseases", json={"symptoms": ["fever"]})
+        assert r.status_code == 200 and r.json() == first.json()
+        r = client.post("/find-diseases", json={"symptoms": ["cough"]})
+        assert r.status_code == 503
+    finally:
+        main.admission = AdmissionController()
@@ -0,0 +1,111 @@
+import csv
+import json
+
+import pandas as pd
+
+from app.aliases import load_alias_table
+from app.data_loader import DataLoader
+
+
+def _write_matrix(tmp_path):
+    df = pd.DataFrame(
+        [
+            {"diseases": "Gastritis", "sharp abdominal pain": 1, "vomiting": 1},
+            {"diseases": "Cold", "sharp abdominal pain": 0, "vomiting": 0},
+        ]
+    )
+    path = tmp_path / "symptom_matrix.csv"
+    df.to_csv(path, index=False)
+    return path
+
+
+def _write_aliases(tmp_path, table):
+    path = tmp_path / "aliases.json"
+    path.write_text(json.dumps(table))
+    return path
+
+
+def test_alias_resolves_before_fuzzy(tmp_path):
+    aliases = _write_aliases(
+        tmp_path,
+        {"Tummy ache!": "sharp abdominal pain", "ghost": "no such symptom"},
+    )
+    loader = DataLoader(_write_matrix(tmp_path), alias_source=aliases)
+    parsed, unmatched = loader.parse_symptoms(["tummy ache", "no throwing up"])
+    assert parsed[0]["col"] == "sharp abdominal pain"
+    assert unmatched == ["no throwing up"]
+    assert loader.snapshot().aliases == {"tummy ache": "sharp abdominal pain"}
+    assert loader.resolution_stats.counts["alias"] == 1
+
+
+def test_alias_table_hot_reload(tmp_path):
+    aliases = _write_aliases(tmp_path, {})
+    loader = DataLoader(_write_matrix(tmp_path), alias_source=aliases)
+    loader.alias_check_interval = 60
+    assert loader.parse_symptoms(["throwing up"])[0] == []
+
+    _write_aliases(tmp_path, {"throwing up": "vomiting"})
+    # checked at most once per interval
+    assert loader.parse_symptoms(["throwing up"])[0] == []
+    loader.alias_check_interval = 0
+    parsed, _ = loader.parse_symptoms(["not throwing up"])
+    assert parsed[0]["col"] == "vomiting" and parsed[0]["negated"]
+
+
+def test_malformed_alias_file_keeps_previous_table(tmp_path, monkeypatch):
+    aliases = _write_aliases(tmp_path, {"throwing up": "vomiting"})
+    loader = DataLoader(_write_matrix(tmp_path), alias_source=aliases)
+    loader.alias_check_interval = 0
+    assert loader.parse_symptoms(["throwing up"])[0][0]["col"] == "vomiting"
+
+    aliases.write_text('{"throwing up": "vom')  # half-written by an editor
+    results = loader.find_diseases_by_symptoms(["vomiting"])
+    assert results[0]["disease"] == "Gastritis"
+    parsed, _ = loader.parse_symptoms(["throwing up"])
+    assert parsed[0]["col"] == "vomiting"
+    assert loader.suggest("throw") == ["throwing up"]
+
+    loads = []
+    monkeypatch.setattr(
+        "app.data_loader.load_alias_table", lambda path: loads.append(path) or {}
+    )
+    loader.parse_symptoms(["throwing up"])
+    assert loads == []  # the bad file is not parsed again until it changes
+
+
+def test_alias_file_checked_once_per_call(tmp_path, monkeypatch):
+    aliases = _write_aliases(tmp_path, {"throwing up": "vomiting"})
+    loader = DataLoader(_write_matrix(tmp_path), alias_source=aliases)
+    loader.alias_check_interval = 0
+    checks = []
+    original = loader.refresh_aliases
+
+    def counting_refresh(*args, **kwargs):
+        checks.append(1)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(loader, "refresh_aliases", counting_refresh)
+    loader.find_diseases_by_symptoms(["throwing up"], use_cache=False)
+    assert len(checks) == 1
+
+
+def test_misses_are_counted_and_exported(tmp_path):
+    loader = DataLoader(_write_matrix(tmp_path))
+    loader.parse_symptoms(["vomitting", "vomitting", "throwing up", "Throwing up"])
+    misses = loader.resolution_stats.top_misses()
+    assert misses["fuzzy"] == [
+        {"input": "vomitting", "symptom": "vomiting", "count": 2}
+    ]
+    assert misses["unmatched"] == [{"input": "throwing up", "count": 2}]
+
+    out = tmp_path / "misses.csv"
+    assert loader.resolution_stats.export(out) == 2
+    with out.open() as f:
+        rows = list(csv.DictReader(f))
+    assert {r["kind"] for r in rows} == {"fuzzy", "unmatched"}
+    assert {r["alias"]: r["fuzzy_guess"] for r in rows} == {
+        "vomitting": "vomiting",
+        "throwing up": "",
+    }
+    # the export is a loadable alias table once symptoms are filled in
+    assert load_alias_table(out) == {}
@@ -3,7 +3,6 @@ from pathlib import Path
 import pandas as pd
 
 import main
-from app.data_loader import DataLoader
 
 client = TestClient(main.app)
 
@@ -28,7 +27,7 @@ def _write_small_matrix(path: Path):
 def test_get_test_endpoint(tmp_path):
     csv = tmp_path / "symptom_matrix.csv"
     _write_small_matrix(csv)
-    main.data_loader = DataLoader(csv)
+    main.registry.register(main.DEFAULT_DATASET, csv)
 
     r = client.get("/test")
     assert r.status_code == 200
@@ -40,7 +39,7 @@ def test_get_test_endpoint(tmp_path):
 def test_post_find_diseases_basic(tmp_path):
     csv = tmp_path / "symptom_matrix.csv"
     _write_small_matrix(csv)
-    main.data_loader = DataLoader(csv)
+    main.registry.register(main.DEFAULT_DATASET, csv)
 
     payload = {"symptoms": ["fever", "cough"], "top_k": 3}
     r = client.post("/find-diseases", json=payload)
@@ -48,3 +47,6 @@ def test_post_find_diseases_basic(tmp_path):
     j = r.json()
     assert "diseases" in j
     assert len(j["diseases"]) > 0
+
+    r = client.post("/find-diseases", json={"symptoms": ["fever"], "top_k": 0})
+    assert r.status_code == 422
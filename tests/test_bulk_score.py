@@ -0,0 +1,139 @@
+import json
+
+import pandas as pd
+import pytest
+
+from app.data_loader import DataLoader
+from scripts import bulk_score
+
+
+def _write_matrix(tmp_path):
+    df = pd.DataFrame(
+        [
+            {"diseases": "Flu", "fever": 1, "cough": 1, "headache": 1, "fatigue": 1},
+            {"diseases": "Cold", "fever": 0, "cough": 1, "headache": 1, "fatigue": 0},
+            {
+                "diseases": "Migraine",
+                "fever": 0,
+                "cough": 0,
+                "headache": 1,
+                "fatigue": 0,
+            },
+            {
+                "diseases": "FoodPoisoning",
+                "fever": 1,
+                "cough": 0,
+                "headache": 0,
+                "fatigue": 1,
+            },
+        ]
+    )
+    path = tmp_path / "symptom_matrix.csv"
+    df.to_csv(path, index=False)
+    return path
+
+
+QUERIES = [
+    ["fever", "cough"],
+    ["feever", "head ache"],
+    ["no cough", "fever"],
+    ["unknownsymptom"],
+    [],
+]
+
+
+def test_batch_matches_single_queries(tmp_path):
+    loader = DataLoader(_write_matrix(tmp_path))
+    parsed = [loader.parse_symptoms(q)[0] for q in QUERIES]
+    batch = loader.find_diseases_batch(parsed, min_hits=1.0, top_k=3)
+    for query, results in zip(QUERIES, batch):
+        single = loader.find_diseases_by_symptoms(query, min_hits=1.0, top_k=3)
+        assert results == single
+
+
+def test_fuzzy_tokens_cached_once(tmp_path):
+    loader = DataLoader(_write_matrix(tmp_path))
+    loader.parse_symptoms(["feever", "feever", "no feever"])
+    assert list(loader.snapshot().token_cache) == [("feever", 0.65)]
+
+
+def test_bulk_cli_jsonl_and_resume(tmp_path):
+    csv = _write_matrix(tmp_path)
+    queries = tmp_path / "queries.jsonl"
+    queries.write_text(
+        "".join(
+            json.dumps({"id": i, "symptoms": q}) + "\n" for i, q in enumerate(QUERIES)
+        )
+    )
+    out = tmp_path / "results.jsonl"
+    args = [str(queries), str(out), "--data", str(csv), "--workers", "1"]
+
+    stats = bulk_score.main(args + ["--batch-size", "2", "--checkpoint-every", "2"])
+    assert stats["scored"] == len(QUERIES)
+    rows = [json.loads(line) for line in out.read_text().splitlines()]
+    assert [r["id"] for r in rows] == list(range(len(QUERIES)))
+    assert rows[0]["diseases"][0]["disease"] == "Flu"
+    assert rows[3]["unmatched"] == ["unknownsymptom"]
+
+    # pretend the run stopped after the first two records
+    ckpt = tmp_path / "results.jsonl.ckpt"
+    state = json.loads(ckpt.read_text())
+    offset = len("".join(out.read_text().splitlines(keepends=True)[:2]).encode())
+    state.update(records=2, sink={"offset": offset})
+    ckpt.write_text(json.dumps(state))
+    with out.open("ab") as f:
+        f.write(b'{"partial": ')
+
+    stats = bulk_score.main(args + ["--resume"])
+    assert stats["scored"] == len(QUERIES) - 2
+    resumed = [json.loads(line) for line in out.read_text().splitlines()]
+    assert resumed == rows
+
+
+def test_bulk_cli_parquet_and_resume(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    csv = _write_matrix(tmp_path)
+    queries = tmp_path / "queries.jsonl"
+    queries.write_text(
+        "".join(
+            json.dumps({"id": i, "symptoms": q}) + "\n" for i, q in enumerate(QUERIES)
+        )
+    )
+    out = tmp_path / "results.parquet"
+    args = [str(queries), str(out), "--data", str(csv), "--workers", "1"]
+
+    stats = bulk_score.main(args + ["--batch-size", "2", "--checkpoint-every", "2"])
+    assert stats["scored"] == len(QUERIES)
+    assert len(list(out.glob("part-*.parquet"))) == 3
+    rows = pq.read_table(out).to_pylist()
+    assert [r["id"] for r in rows] == [str(i) for i in range(len(QUERIES))]
+    assert json.loads(rows[0]["diseases"])[0]["disease"] == "Flu"
+    assert rows[3]["unmatched"] == ["unknownsymptom"]
+
+    # pretend the run stopped after the first part, leaving a stray part
+    ckpt = tmp_path / "results.parquet.ckpt"
+    state = json.loads(ckpt.read_text())
+    state.update(records=2, sink={"parts": 1})
+    ckpt.write_text(json.dumps(state))
+    (out / "part-00007.parquet").write_bytes(b"partial")
+
+    stats = bulk_score.main(args + ["--resume"])
+    assert stats["scored"] == len(QUERIES) - 2
+    assert sorted(p.name for p in out.glob("part-*.parquet")) == [
+        "part-00000.parquet",
+        "part-00001.parquet",
+    ]
+    assert pq.read_table(out).to_pylist() == rows
+
+
+def test_resume_without_output_fails_clearly(tmp_path):
+    csv = _write_matrix(tmp_path)
+    queries = tmp_path / "queries.jsonl"
+    queries.write_text(json.dumps({"id": 0, "symptoms": ["fever"]}) + "\n")
+    out = tmp_path / "results.jsonl"
+    args = [str(queries), str(out), "--data", str(csv), "--workers", "1"]
+    bulk_score.main(args)
+    out.unlink()
+
+    with pytest.raises(RuntimeError, match="output .* is missing"):
+        bulk_score.main(args + ["--resume"])
@@ -67,3 +67,22 @@ def test_weights_and_min_hits(tmp_path):
     assert results
     diseases = [r["disease"] for r in results]
     assert "Flu" in diseases and "FoodPoisoning" in diseases
+
+
+def test_results_are_cached(tmp_path):
+    path = _write_matrix(tmp_path)
+    loader = DataLoader(Path(path))
+    assert loader.cached_result(["fever", "cough"], top_k=3) is None
+    first = loader.find_diseases_by_symptoms(["fever", "cough"], top_k=3)
+    assert loader.cached_result(["fever", "cough"], top_k=3) == first
+    assert loader.find_diseases_by_symptoms(["fever", "cough"], top_k=3) == first
+    assert loader.cached_result(["fever", "cough"], top_k=4) is None
+
+
+def test_cache_hits_count_resolutions(tmp_path):
+    loader = DataLoader(Path(_write_matrix(tmp_path)))
+    for _ in range(5):
+        loader.find_diseases_by_symptoms(["feever", "fever"])
+    stats = loader.resolution_stats
+    assert stats.counts["fuzzy"] == 5 and stats.counts["exact"] == 5
+    assert stats.top_misses()["fuzzy"][0]["count"] == 5
@@ -0,0 +1,82 @@
+import tracemalloc
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+import main
+from app.data_loader import DataLoader
+from app.profiling import memory_report, profile_call
+from scripts import memory_report as memory_report_cli
+
+
+def _write_matrix(tmp_path):
+    df = pd.DataFrame(
+        [
+            {"diseases": "Flu", "fever": 1, "cough": 1},
+            {"diseases": "Cold", "fever": 0, "cough": 1},
+        ]
+    )
+    path = tmp_path / "symptom_matrix.csv"
+    df.to_csv(path, index=False)
+    return path
+
+
+def test_profile_call_reports_functions_and_allocations(tmp_path):
+    loader = DataLoader(_write_matrix(tmp_path))
+    results, report = profile_call(
+        loader.find_diseases_by_symptoms, ["fever"], top=5, use_cache=False
+    )
+    assert results[0]["disease"] == "Flu"
+    assert 0 < len(report["functions"]) <= 5
+    assert any(
+        "find_diseases_by_symptoms" in f["function"] for f in report["functions"]
+    )
+    assert report["allocations"]["peak_bytes"] > 0
+    assert report["allocations"]["top"]
+    assert not tracemalloc.is_tracing()
+
+
+def test_profile_call_keeps_existing_tracing(tmp_path):
+    loader = DataLoader(_write_matrix(tmp_path))
+    tracemalloc.start()
+    try:
+        _, report = profile_call(
+            loader.find_diseases_by_symptoms, ["fever"], use_cache=False
+        )
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+    assert report["allocations"]["peak_bytes"] > 0
+    assert report["allocations"]["top"]
+
+
+def test_profile_endpoint_is_gated(tmp_path):
+    main.registry.register(main.DEFAULT_DATASET, _write_matrix(tmp_path))
+    client = TestClient(main.app)
+    payload = {"symptoms": ["fever"]}
+
+    main.profiling_enabled = False
+    r = client.post("/find-diseases", json=payload, headers={"X-Debug-Profile": "1"})
+    assert r.status_code == 403
+
+    main.profiling_enabled = True
+    try:
+        r = client.post("/find-diseases?profile=1", json=payload)
+    finally:
+        main.profiling_enabled = False
+    assert r.status_code == 200
+    assert r.json()["diseases"][0]["disease"] == "Flu"
+    assert r.json()["profile"]["functions"]
+
+
+def test_memory_report_components(tmp_path):
+    csv = _write_matrix(tmp_path)
+    loader = DataLoader(csv)
+    loader.find_diseases_by_symptoms(["feever"])
+    report = memory_report(loader)
+    for key in ("matrix", "labels", "column_index", "fuzzy_index", "result_cache"):
+        assert report[key] > 0
+    assert report["dense_matrix"] == 0
+
+    cli = memory_report_cli.main(["--data", str(csv), "--warm", "fever", "--batch"])
+    assert cli["dense_matrix"] > 0
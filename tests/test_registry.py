@@ -0,0 +1,155 @@
+import json
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+import main
+from app.registry import DatasetRegistry
+
+
+def _write_matrix(path, disease):
+    pd.DataFrame(
+        [
+            {"diseases": disease, "fever": 1, "cough": 1},
+            {"diseases": "Cold", "fever": 0, "cough": 1},
+        ]
+    ).to_csv(path, index=False)
+    return path
+
+
+def test_lazy_load_and_hits(tmp_path):
+    registry = DatasetRegistry()
+    registry.register("a", _write_matrix(tmp_path / "a.csv", "Flu"))
+    assert registry.stats()["datasets"]["a"]["loaded"] is False
+
+    with registry.lease("a"):
+        pass
+    with registry.lease("a"):
+        pass
+    stats = registry.stats()["datasets"]["a"]
+    assert stats["loaded"] is True
+    assert stats["loads"] == 1 and stats["hits"] == 1
+    assert stats["memory_bytes"] > 0
+
+
+def test_lru_eviction_over_budget(tmp_path):
+    registry = DatasetRegistry(memory_budget=1)
+    for name in ("a", "b"):
+        registry.register(name, _write_matrix(tmp_path / f"{name}.csv", name))
+
+    with registry.lease("a"):
+        pass
+    with registry.lease("b"):
+        pass
+    stats = registry.stats()["datasets"]
+    assert stats["a"]["loaded"] is False and stats["a"]["evictions"] == 1
+    assert stats["b"]["loaded"] is True
+
+    with registry.lease("a"):
+        pass
+    assert registry.stats()["datasets"]["a"]["loads"] == 2
+
+
+def test_pinned_dataset_not_evicted(tmp_path):
+    registry = DatasetRegistry(memory_budget=1)
+    for name in ("a", "b"):
+        registry.register(name, _write_matrix(tmp_path / f"{name}.csv", name))
+
+    with registry.lease("a") as a:
+        with registry.lease("b"):
+            assert registry.stats()["datasets"]["a"]["loaded"] is True
+            assert a.find_diseases_by_symptoms(["fever"])[0]["disease"] == "a"
+        assert a._snapshot is not None  # never closed under the request
+    stats = registry.stats()["datasets"]
+    assert stats["a"]["loads"] == 1 and stats["a"]["in_use"] == 0
+    assert stats["a"]["loaded"] is False and stats["a"]["evictions"] == 1
+    assert stats["b"]["loaded"] is True and stats["b"]["evictions"] == 0
+
+
+def test_acquire_loaded_never_loads(tmp_path):
+    registry = DatasetRegistry()
+    registry.register("a", _write_matrix(tmp_path / "a.csv", "Flu"))
+    assert registry.acquire_loaded("a") is None
+    with registry.lease("a") as loader:
+        pass
+    assert registry.acquire_loaded("a") is loader
+    registry.release("a")
+    stats = registry.stats()["datasets"]["a"]
+    assert stats["loads"] == 1 and stats["hits"] == 1 and stats["in_use"] == 0
+
+
+def test_memory_follows_caches(tmp_path):
+    registry = DatasetRegistry()
+    registry.register("a", _write_matrix(tmp_path / "a.csv", "Flu"))
+    with registry.lease("a") as loader:
+        before = registry.stats()["datasets"]["a"]["memory_bytes"]
+        for n in range(20):
+            loader.find_diseases_by_symptoms(["fever", f"symptom {n}"])
+    assert registry.stats()["datasets"]["a"]["memory_bytes"] > before
+
+
+def test_request_selects_dataset(tmp_path):
+    config = tmp_path / "datasets.json"
+    config.write_text(
+        json.dumps(
+            {
+                "memory_budget_mb": 64,
+                "datasets": {
+                    "internal": {"path": str(_write_matrix(tmp_path / "i.csv", "X"))}
+                },
+            }
+        )
+    )
+    main.registry = DatasetRegistry.from_config(config)
+    client = TestClient(main.app)
+
+    r = client.post(
+        "/find-diseases", json={"symptoms": ["fever"], "dataset": "internal"}
+    )
+    assert r.status_code == 200
+    assert r.json()["diseases"][0]["disease"] == "X"
+
+    r = client.post("/find-diseases", json={"symptoms": ["fever"], "dataset": "nope"})
+    assert r.status_code == 404
+
+    r = client.get("/datasets")
+    assert r.json()["datasets"]["internal"]["hits"] == 0
+
+
+def test_cache_hit_on_loaded_dataset_stays_on_event_loop(tmp_path, monkeypatch):
+    main.registry = DatasetRegistry()
+    main.registry.register("a", _write_matrix(tmp_path / "a.csv", "Flu"))
+    client = TestClient(main.app)
+    payload = {"symptoms": ["fever"], "dataset": "a"}
+    first = client.post("/find-diseases", json=payload)
+    assert first.status_code == 200
+
+    async def no_threadpool(*args, **kwargs):
+        raise AssertionError("cache hit went through the threadpool")
+
+    monkeypatch.setattr(main, "run_in_threadpool", no_threadpool)
+    r = client.post("/find-diseases", json=payload)
+    assert r.status_code == 200 and r.json() == first.json()
+
+
+def test_default_dataset_is_registered(tmp_path, monkeypatch):
+    config = tmp_path / "datasets.json"
+    config.write_text(
+        json.dumps({"datasets": {"x": {"path": str(tmp_path / "x.csv")}}})
+    )
+    monkeypatch.setenv("DATASETS_CONFIG", str(config))
+    monkeypatch.setenv("SCORER_SHARDS", "3")
+    registry = main._build_registry()
+    assert registry.names() == ["x", main.DEFAULT_DATASET]
+    assert registry.loader(main.DEFAULT_DATASET).shards == 3
+
+    main.registry = DatasetRegistry(memory_budget=1)
+    main.registry.register(main.DEFAULT_DATASET, _write_matrix(tmp_path / "d.csv", "D"))
+    main.registry.register("a", _write_matrix(tmp_path / "a.csv", "A"))
+    client = TestClient(main.app)
+    r = client.post("/find-diseases", json={"symptoms": ["fever"]})
+    assert r.json()["diseases"][0]["disease"] == "D"
+    client.post("/find-diseases", json={"symptoms": ["fever"], "dataset": "a"})
+
+    stats = client.get("/datasets").json()["datasets"][main.DEFAULT_DATASET]
+    assert stats["loads"] == 1 and stats["evictions"] == 1  # counts toward budget
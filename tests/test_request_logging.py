@@ -0,0 +1,87 @@
+import io
+import json
+import logging
+import queue
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+import main
+from app import request_logging
+from app.request_logging import (
+    DeferredQueueHandler,
+    configure_logging,
+    dropped_records,
+    request_id_var,
+    shutdown_logging,
+)
+
+
+def _records(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_records_are_structured_and_tagged():
+    stream = io.StringIO()
+    configure_logging(stream=stream, loggers=("app.test",))
+    token = request_id_var.set("req-1")
+    try:
+        logging.getLogger("app.test").info(
+            "hello %s", "world", extra={"fields": {"n": 3, "msg": "x", "level": 1}}
+        )
+    finally:
+        request_id_var.reset(token)
+        shutdown_logging()
+    [rec] = _records(stream)
+    assert rec["msg"] == "hello world"
+    assert rec["request_id"] == "req-1"
+    assert rec["n"] == 3 and rec["level"] == "INFO"
+
+
+def test_sampling_drops_info_but_keeps_warnings():
+    stream = io.StringIO()
+    configure_logging(stream=stream, sample_rate=0.0, loggers=("app.test",))
+    log = logging.getLogger("app.test")
+    try:
+        log.info("dropped")
+        log.warning("kept")
+    finally:
+        shutdown_logging()
+    assert [r["msg"] for r in _records(stream)] == ["kept"]
+
+
+def test_request_id_header_round_trip(tmp_path):
+    csv = tmp_path / "symptom_matrix.csv"
+    pd.DataFrame([{"diseases": "Flu", "fever": 1, "cough": 1}]).to_csv(csv, index=False)
+    main.registry.register(main.DEFAULT_DATASET, csv)
+    stream = io.StringIO()
+    configure_logging(stream=stream)
+    try:
+        r = TestClient(main.app).post(
+            "/find-diseases",
+            json={"symptoms": ["fever"]},
+            headers={"X-Request-ID": "abc123"},
+        )
+    finally:
+        shutdown_logging()
+    assert r.headers["X-Request-ID"] == "abc123"
+    records = _records(stream)
+    assert records and all(rec["request_id"] == "abc123" for rec in records)
+    assert any(rec["logger"] == "app.data_loader" for rec in records)
+
+
+def test_dropped_records_are_counted_and_reported(caplog):
+    handler = DeferredQueueHandler(queue.Queue(1))
+    log = logging.getLogger("app.test.full")
+    for _ in range(3):
+        handler.handle(log.makeRecord(log.name, logging.INFO, "", 0, "m", (), None))
+    assert handler.dropped == 2
+
+    configure_logging(stream=io.StringIO(), loggers=("app.test",))
+    request_logging._handler.dropped = 5
+    assert dropped_records() == 5
+    assert TestClient(main.app).get("/logging/stats").json() == {"dropped": 5}
+    with caplog.at_level(logging.WARNING):
+        shutdown_logging()
+    assert "dropped 5 log records" in caplog.text
+    assert dropped_records() == 0
@@ -0,0 +1,138 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.data_loader import DataLoader
+from app.sharding import ShardedScorer
+
+
+def _write_random_matrix(tmp_path, n_rows=400, n_cols=12, n_diseases=40):
+    rng = np.random.default_rng(0)
+    data = rng.integers(0, 2, size=(n_rows, n_cols))
+    df = pd.DataFrame(data, columns=[f"symptom {i}" for i in range(n_cols)])
+    df.insert(0, "diseases", [f"D{i % n_diseases}" for i in range(n_rows)])
+    path = tmp_path / "symptom_matrix.csv"
+    df.to_csv(path, index=False)
+    return path
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_sharded_matches_single_scan(tmp_path, executor):
+    csv = _write_random_matrix(tmp_path)
+    query = ["symptom 1", "symptom 4", "no symptom 7", "symptom 9"]
+
+    expected = DataLoader(csv).find_diseases_by_symptoms(query, top_k=10)
+    loader = DataLoader(csv, shards=4, workers=2, executor=executor)
+    try:
+        results = loader.find_diseases_by_symptoms(query, top_k=10)
+    finally:
+        loader.close()
+
+    pairs = [(r["disease"], r["score"]) for r in results]
+    assert pairs == [(r["disease"], r["score"]) for r in expected]
+    assert len({r["disease"] for r in results}) == len(results)
+
+
+def test_sharded_small_matrix(tmp_path):
+    csv = tmp_path / "symptom_matrix.csv"
+    pd.DataFrame(
+        [
+            {"diseases": "Flu", "fever": 1, "cough": 1},
+            {"diseases": "Cold", "fever": 0, "cough": 1},
+            {"diseases": "Flu", "fever": 1, "cough": 0},
+        ]
+    ).to_csv(csv, index=False)
+    loader = DataLoader(csv, shards=3, executor="thread")
+    try:
+        results = loader.find_diseases_by_symptoms(["fever", "cough"], top_k=5)
+    finally:
+        loader.close()
+    assert [r["disease"] for r in results] == ["Flu", "Cold"]
+    assert results[0]["matched_symptoms"] == ["fever", "cough"]
+
+
+def test_merge_dedups_across_shards():
+    matrix = np.array([[1, 0], [1, 1], [0, 1], [1, 1]], dtype=np.float32)
+    codes = np.array([0, 1, 2, 1])
+    scorer = ShardedScorer(matrix, codes, shards=2, executor="thread")
+    try:
+        hits = scorer.top_k(np.array([0, 1]), np.array([1.0, 1.0]), 1.0, 5)
+    finally:
+        scorer.close()
+    assert hits == [(1, 2.0), (0, 1.0), (2, 1.0)]
+
+
+@pytest.mark.parametrize("shards", [1, 2])
+def test_top_k_below_one_rejected(tmp_path, shards):
+    loader = DataLoader(
+        _write_random_matrix(tmp_path), shards=shards, executor="thread"
+    )
+    try:
+        for top_k in (0, -1):
+            with pytest.raises(ValueError):
+                loader.find_diseases_by_symptoms(["symptom 1"], top_k=top_k)
+            with pytest.raises(ValueError):
+                loader.find_diseases_batch([], top_k=top_k)
+    finally:
+        loader.close()
+
+
+def test_process_pool_does_not_fork():
+    matrix = np.array([[1, 0], [1, 1]], dtype=np.float32)
+    scorer = ShardedScorer(matrix, np.array([0, 1]), shards=2, executor="process")
+    try:
+        assert scorer.top_k(np.array([0]), np.array([1.0]), 1.0, 5)
+        assert scorer._pool._mp_context.get_start_method() != "fork"
+    finally:
+        scorer.close()
+
+
+def test_invalid_executor():
+    with pytest.raises(ValueError):
+        ShardedScorer(np.zeros((2, 2)), np.zeros(2), executor="gpu")
+
+
+def test_concurrent_first_use_loads_once(tmp_path, monkeypatch):
+    csv = _write_random_matrix(tmp_path)
+    loader = DataLoader(csv, shards=2, executor="thread")
+    loads = []
+    original = loader.load_matrix
+
+    def counting_load():
+        loads.append(threading.get_ident())
+        return original()
+
+    monkeypatch.setattr(loader, "load_matrix", counting_load)
+    try:
+        with ThreadPoolExecutor(4) as pool:
+            snaps = list(pool.map(lambda _: loader.snapshot(), range(4)))
+    finally:
+        loader.close()
+    assert len(loads) == 1
+    assert all(s is snaps[0] for s in snaps)
+
+
+def test_reload_keeps_leased_scorer_open(tmp_path):
+    csv = _write_random_matrix(tmp_path)
+    loader = DataLoader(csv, shards=2, executor="thread")
+    query = ["symptom 1", "symptom 4"]
+    try:
+        with loader.lease() as old:
+            _write_random_matrix(tmp_path, n_rows=300)
+            st = csv.stat()
+            os.utime(csv, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+            new = loader.snapshot()
+            assert new is not old
+            assert old.scorer is not None  # still in use
+            assert loader._sharded_top_k(
+                old, [{"col": "symptom 1", "negated": False}], {}, 1.0, 3
+            )
+        assert old.scorer is None  # closed once released
+        assert loader.find_diseases_by_symptoms(query)
+    finally:
+        loader.close()
+    assert new.scorer is None